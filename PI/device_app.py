@@ -1,7 +1,13 @@
 import os
 import json
 import time
+import uuid
+import bisect
+import itertools
+import queue
+import threading
 import requests
+import socket
 import platform
 import subprocess
 from datetime import datetime, timezone, timedelta
@@ -20,124 +26,497 @@ DEVICE_TOKEN = config.get("device_token", "")
 VIDEO_DIR = os.path.join(os.getcwd(), "videos_pi")
 os.makedirs(VIDEO_DIR, exist_ok=True)
 
-SCHEDULE_FILE = os.path.join(os.getcwd(), "schedule.json")
-CHECK_INTERVAL = 60  # check every minute for what to play
-REFRESH_INTERVAL = 3 * 60  # refresh schedule every 5 minutes
+STORE_FILE = os.path.join(os.getcwd(), "schedule_store.json")
+OFFLINE_GRACE_HOURS = float(config.get("offline_grace_hours", 24))  # keep playing the cached plan this long
+TELEMETRY_FILE = os.path.join(os.getcwd(), "telemetry_buffer.jsonl")
+TELEMETRY_BATCH_SIZE = int(config.get("telemetry_batch_size", 200))
+TELEMETRY_FLUSH_INTERVAL = 60  # seconds between telemetry uploads
+REFRESH_INTERVAL = 3 * 60  # refresh schedule every 3 minutes
 PLAY_WINDOW_HOURS = 2
+CACHE_INDEX_FILE = os.path.join(VIDEO_DIR, "cache_index.json")
+CACHE_MAX_BYTES = int(config.get("cache_max_bytes", 8 * 1024 ** 3))  # disk budget for videos_pi
 IST = timezone(timedelta(hours=5, minutes=30))
 IS_WINDOWS = platform.system() == "Windows"
+VLC_RC_HOST = "127.0.0.1"
+VLC_RC_PORT = int(config.get("vlc_rc_port", 4212))
 
 vlc_process = None
-current_video = None
+vlc_rc = None  # socket to VLC's RC interface
+current_playlist = None
+playlist_started_at = None
 last_refresh = None
+timeline = []         # sorted (start_ts, end_ts, playlist) segments
+timeline_bounds = []  # segment starts plus the final end, for bisect
+cache_index = {}  # local path -> {"size": bytes, "last_needed": epoch seconds}
+schedule_store = {"etag": None, "validated_at": 0, "schedules": [], "default_video": None}
+_http = threading.local()
+telemetry_lock = threading.Lock()
+
+prefetch_queue = queue.PriorityQueue()  # (start_ts, seq, video_id, schedule_group_id, url, title)
+prefetch_seq = itertools.count()  # tie-breaker so entries never compare past start_ts
+prefetch_seen = set()  # (video_id, schedule_group_id) queued, or downloaded and reported
+prefetch_lock = threading.Lock()
+wake_event = threading.Event()  # set by the prefetch worker when new content becomes ready
 
 # ---------------- Helpers ----------------------------
+def http_session():
+    """Keep-alive session for the calling thread (Sessions aren't shared across threads)."""
+    if not hasattr(_http, "session"):
+        _http.session = requests.Session()
+    return _http.session
+
 def safe_filename(title, video_id):
     base = "".join(c for c in title if c.isalnum() or c in (' ', '_')).rstrip()
     return os.path.join(VIDEO_DIR, f"{base}_{video_id}.mp4")
 
 def download_video(video_id, video_url, title):
+    """Download to a .part file and rename, so a partial file is never played.
+
+    Returns the local path, or None if the download failed.
+    """
     local_path = safe_filename(title, video_id)
     if os.path.exists(local_path):
         return local_path
     print(f"[DOWNLOADING] {title}")
+    part_path = local_path + ".part"
     try:
-        resp = requests.get(video_url, stream=True, timeout=60)
+        resp = http_session().get(video_url, stream=True, timeout=60)
         resp.raise_for_status()
-        with open(local_path, "wb") as f:
+        with open(part_path, "wb") as f:
             for chunk in resp.iter_content(8192):
                 f.write(chunk)
+        os.replace(part_path, local_path)
         print(f"[OK] Saved {local_path}")
+        return local_path
     except Exception as e:
         print(f"[ERROR] Downloading {title}: {e}")
-    return local_path
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return None
+
+# ---------------- Prefetch ----------------------------
+def report_download_status(video_id, schedule_group_id):
+    try:
+        resp = http_session().post(f"{API_BASE}/api/devices/update-download-status",
+                                   json={"device_token": DEVICE_TOKEN,
+                                         "video_id": video_id,
+                                         "schedule_group_id": schedule_group_id},
+                                   timeout=10)
+        resp.raise_for_status()
+        return True
+    except Exception as e:
+        print(f"[ERROR] Reporting download status for video {video_id}: {e}")
+        return False
+
+def enqueue_prefetch(start_ts, video, schedule_group_id):
+    key = (int(video["video_id"]), schedule_group_id)
+    with prefetch_lock:
+        if key in prefetch_seen:
+            return
+        prefetch_seen.add(key)
+    prefetch_queue.put((start_ts, next(prefetch_seq), key[0], schedule_group_id, video["video_link"], video["title"]))
+
+def prefetch_worker():
+    """Download queued videos earliest-start first and report readiness to the server."""
+    while True:
+        start_ts, _, video_id, schedule_group_id, url, title = prefetch_queue.get()
+        already_cached = os.path.exists(safe_filename(title, video_id))
+        ok = download_video(video_id, url, title) is not None
+        if not already_cached:
+            record_event("download", video_id=video_id, schedule_group_id=schedule_group_id,
+                         detail="ok" if ok else "failed")
+        if ok:
+            ok = report_download_status(video_id, schedule_group_id)
+            if not already_cached:
+                wake_event.set()
+        if not ok:
+            # Let the next refresh queue it again
+            with prefetch_lock:
+                prefetch_seen.discard((video_id, schedule_group_id))
+        prefetch_queue.task_done()
+
+# ---------------- Telemetry ----------------------------
+def buffer_events(events):
+    """Append events to the local buffer; the telemetry worker uploads them later."""
+    with telemetry_lock:
+        with open(TELEMETRY_FILE, "a") as f:
+            f.writelines(json.dumps(ev) + "\n" for ev in events)
+
+def new_event(event_type, ts, **fields):
+    """An event with a unique id, so the backend can drop it if a batch is re-sent."""
+    return {"id": uuid.uuid4().hex, "type": event_type, "ts": ts, **fields}
+
+def record_event(event_type, **fields):
+    buffer_events([new_event(event_type, datetime.now(IST).isoformat(), **fields)])
+
+def video_id_from_path(path):
+    try:
+        return int(os.path.basename(path).rsplit("_", 1)[1].split(".")[0])
+    except (IndexError, ValueError):
+        return None
+
+def record_playback(playlist, started_at):
+    """Log proof of play for a playlist that has just been taken off screen.
+
+    VLC loops the playlist on its own, so screen time is split evenly
+    between its videos rather than tracked per item.
+    """
+    if not playlist or started_at is None:
+        return
+    elapsed = time.time() - started_at
+    ts = datetime.fromtimestamp(started_at, IST).isoformat()
+    buffer_events([
+        new_event("play", ts, video_id=video_id_from_path(path), duration=max(0, int(elapsed / len(playlist))))
+        for path in playlist
+    ])
+
+def flush_telemetry():
+    """Upload buffered events in batches of TELEMETRY_BATCH_SIZE.
+
+    The buffer is moved aside before sending so new events keep appending;
+    whatever fails to upload stays in the outbox for the next flush. Lines
+    that don't parse are skipped and removed from the outbox.
+    """
+    outbox = TELEMETRY_FILE + ".sending"
+    with telemetry_lock:
+        if not os.path.exists(outbox):
+            if not os.path.exists(TELEMETRY_FILE):
+                return
+            os.replace(TELEMETRY_FILE, outbox)
+    events, malformed = [], 0
+    with open(outbox, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                malformed += 1  # e.g. a line cut short by a power loss mid-write
+    if malformed:
+        print(f"[WARN] Dropped {malformed} malformed telemetry lines")
+        with open(outbox, "w") as f:
+            f.writelines(json.dumps(ev) + "\n" for ev in events)
+
+    sent = 0
+    while sent < len(events):
+        batch = events[sent:sent + TELEMETRY_BATCH_SIZE]
+        try:
+            resp = http_session().post(f"{API_BASE}/api/devices/telemetry",
+                                       json={"device_token": DEVICE_TOKEN, "events": batch},
+                                       timeout=10)
+            resp.raise_for_status()
+        except Exception as e:
+            print(f"[ERROR] Uploading telemetry: {e}")
+            break
+        sent += len(batch)
+
+    if sent == len(events):
+        os.remove(outbox)
+    elif sent:
+        with open(outbox, "w") as f:
+            f.writelines(json.dumps(ev) + "\n" for ev in events[sent:])
+
+def telemetry_worker():
+    while True:
+        time.sleep(TELEMETRY_FLUSH_INTERVAL)
+        try:
+            flush_telemetry()
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Telemetry buffer: {e}")
+
+# ---------------- Video Cache ----------------------------
+def load_cache_index():
+    global cache_index
+    try:
+        with open(CACHE_INDEX_FILE, "r") as f:
+            cache_index = json.load(f)
+    except (OSError, ValueError):
+        cache_index = {}
+
+def save_cache_index():
+    try:
+        with open(CACHE_INDEX_FILE, "w") as f:
+            json.dump(cache_index, f, indent=2)
+    except OSError as e:
+        print(f"[ERROR] Writing cache index: {e}")
+
+def mark_needed(paths):
+    """Record that these files are referenced by the schedule right now."""
+    now = time.time()
+    for path in paths:
+        if path and os.path.exists(path):
+            cache_index[path] = {"size": os.path.getsize(path), "last_needed": now}
+
+def sync_cache_index():
+    """Drop entries for deleted files and adopt files the index doesn't know yet."""
+    on_disk = {
+        os.path.join(VIDEO_DIR, name)
+        for name in os.listdir(VIDEO_DIR)
+        if name.endswith(".mp4")
+    }
+    for path in list(cache_index):
+        if path not in on_disk:
+            cache_index.pop(path, None)
+    for path in on_disk - set(cache_index):
+        # Unknown files (e.g. from before the index existed) age from their mtime
+        cache_index[path] = {"size": os.path.getsize(path), "last_needed": os.path.getmtime(path)}
+
+def enforce_cache_budget(protected):
+    """Evict least-recently-needed videos until the cache fits CACHE_MAX_BYTES.
+
+    Files in `protected` (current/upcoming schedule window and the default
+    video) are never evicted, even if that leaves the cache over budget.
+    """
+    sync_cache_index()
+    total = sum(entry["size"] for entry in cache_index.values())
+    if total > CACHE_MAX_BYTES:
+        candidates = sorted(
+            (path for path in cache_index if path not in protected),
+            key=lambda path: cache_index[path]["last_needed"]
+        )
+        for path in candidates:
+            if total <= CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"[ERROR] Evicting {path}: {e}")
+                continue
+            total -= cache_index.pop(path)["size"]
+            print(f"[EVICTED] {os.path.basename(path)}")
+        if total > CACHE_MAX_BYTES:
+            print(f"[WARN] Cache over budget ({total} > {CACHE_MAX_BYTES} bytes); remaining files are scheduled")
+    save_cache_index()
+
+# ---------------- Schedule Store ----------------------------
+def load_schedule_store():
+    try:
+        with open(STORE_FILE, "r") as f:
+            schedule_store.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+def save_schedule_store():
+    try:
+        tmp_path = STORE_FILE + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(schedule_store, f)
+        os.replace(tmp_path, STORE_FILE)
+    except OSError as e:
+        print(f"[ERROR] Writing schedule store: {e}")
+
+def store_is_fresh():
+    return time.time() - schedule_store["validated_at"] <= OFFLINE_GRACE_HOURS * 3600
 
 def fetch_default_video():
     try:
-        resp = requests.get(f"{API_BASE}/api/videos/default-video", timeout=10)
+        resp = http_session().get(f"{API_BASE}/api/videos/default-video", timeout=10)
         resp.raise_for_status()
         data = resp.json()
-        return download_video(data["video_id"], data["video_link"], data["title"])
+        schedule_store["default_video"] = {k: data[k] for k in ("video_id", "video_link", "title")}
+        save_schedule_store()
     except Exception as e:
         print(f"[ERROR] Fetching default video: {e}")
-        return None
+        data = schedule_store["default_video"]
+        if not data:
+            return None
+        print("[OFFLINE] Using cached default video")
+    return download_video(data["video_id"], data["video_link"], data["title"])
 
 def fetch_schedules():
+    """Revalidate the stored schedules with the server.
+
+    Sends the stored ETag so an unchanged plan costs a 304 with no body. If
+    the server can't be reached, the stored plan keeps playing until it is
+    older than OFFLINE_GRACE_HOURS.
+    """
+    headers = {}
+    if schedule_store["etag"] and schedule_store["validated_at"]:
+        headers["If-None-Match"] = schedule_store["etag"]
     try:
-        resp = requests.post(f"{API_BASE}/api/devices/fetch-schedules",
-                             json={"device_token": DEVICE_TOKEN}, timeout=10)
-        resp.raise_for_status()
-        return resp.json().get("schedules", [])
+        resp = http_session().post(f"{API_BASE}/api/devices/fetch-schedules",
+                                   json={"device_token": DEVICE_TOKEN},
+                                   headers=headers, timeout=10)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+            schedule_store["schedules"] = resp.json().get("schedules", [])
+            schedule_store["etag"] = resp.headers.get("ETag")
+        schedule_store["validated_at"] = time.time()
+        save_schedule_store()
     except Exception as e:
         print(f"[ERROR] Fetch schedules failed: {e}")
-        return []
+        if not store_is_fresh():
+            print("[OFFLINE] Cached schedules expired; falling back to default video")
+            return []
+        print("[OFFLINE] Playing cached schedules")
+    return schedule_store["schedules"]
 
-def generate_schedule_data(schedules, default_video_path):
-    now = datetime.now(IST)
-    end_time = now + timedelta(hours=PLAY_WINDOW_HOURS)
-    timeline = {}
+def build_timeline(schedules, default_video_path):
+    """Flatten schedules into contiguous (start, end, playlist) segments.
 
-    # Fill next 2 hours minute by minute with default
-    current = now.replace(second=0, microsecond=0)
-    while current < end_time:
-        timeline[current.strftime("%Y-%m-%d %H:%M")] = default_video_path
-        current += timedelta(minutes=1)
+    Segments cover [now, now + PLAY_WINDOW_HOURS) as epoch seconds, sorted by
+    start; gaps are filled with the default video. A schedule's playlist is
+    its videos in order_index order. Where schedules overlap the later one in
+    the server's ordering wins, as with the old per-minute map. Videos that
+    are not downloaded yet are queued for prefetch and left out of the
+    playlist (falling back to the default video) until they are ready.
+    """
+    now = time.time()
+    window_end = now + PLAY_WINDOW_HOURS * 3600
+    intervals = []
+    needed = {default_video_path}
 
-    # Fill scheduled videos
     for sch in schedules:
         try:
-            start_time = datetime.fromisoformat(sch["start_time"]).astimezone(IST)
-            end_time = datetime.fromisoformat(sch["end_time"]).astimezone(IST)
+            start_ts = datetime.fromisoformat(sch["start_time"]).astimezone(IST).timestamp()
+            end_ts = datetime.fromisoformat(sch["end_time"]).astimezone(IST).timestamp()
         except Exception:
             continue
 
-        # skip schedules outside the next 2 hours
-        if end_time < now or start_time > end_time:
+        if end_ts <= now or end_ts <= start_ts:
             continue
 
-        for v in sch.get("videos", []):
-            local_path = download_video(int(v["video_id"]), v["video_link"], v["title"])
-            cur = start_time.replace(second=0, microsecond=0)
-            while cur < end_time and cur.strftime("%Y-%m-%d %H:%M") in timeline:
-                timeline[cur.strftime("%Y-%m-%d %H:%M")] = local_path
-                cur += timedelta(minutes=1)
+        videos = sorted(sch.get("videos", []), key=lambda v: v.get("order_index", 0))
+        playlist = []
+        for v in videos:
+            local_path = safe_filename(v["title"], int(v["video_id"]))
+            needed.add(local_path)
+            enqueue_prefetch(start_ts, v, sch.get("schedule_group_id"))
+            if os.path.exists(local_path):
+                playlist.append(local_path)
 
-    with open(SCHEDULE_FILE, "w") as f:
-        json.dump(timeline, f, indent=2)
-    print(f"[UPDATED] schedule.json with {len(timeline)} minutes of data.")
+        # only the play window goes on the timeline
+        if playlist and start_ts < window_end:
+            intervals.append((max(start_ts, now), min(end_ts, window_end), playlist))
 
-def get_video_for_now():
-    now_key = datetime.now(IST).strftime("%Y-%m-%d %H:%M")
-    if not os.path.exists(SCHEDULE_FILE):
-        return None
-    try:
-        with open(SCHEDULE_FILE, "r") as f:
-            data = json.load(f)
-        return data.get(now_key)
-    except Exception as e:
-        print(f"[ERROR] Reading schedule.json: {e}")
-        return None
+    bounds = sorted({now, window_end}.union(*[(s, e) for s, e, _ in intervals]))
+    segments = []
+    for seg_start, seg_end in zip(bounds, bounds[1:]):
+        playlist = [default_video_path]
+        for s, e, p in reversed(intervals):
+            if s <= seg_start < e:
+                playlist = p
+                break
+        if segments and segments[-1][2] == playlist:
+            segments[-1] = (segments[-1][0], seg_end, playlist)
+        else:
+            segments.append((seg_start, seg_end, playlist))
 
-def play_video(path):
-    global vlc_process
-    if not path:
-        return
-    if vlc_process:
+    mark_needed(needed)
+    enforce_cache_budget(needed)
+    return segments
+
+def set_timeline(segments):
+    global timeline, timeline_bounds
+    timeline = segments
+    timeline_bounds = [s for s, _, _ in segments] + ([segments[-1][1]] if segments else [])
+    print(f"[UPDATED] Timeline with {len(segments)} segments.")
+
+def video_at(ts):
+    """Return the playlist scheduled at epoch `ts`, or None outside the timeline."""
+    idx = bisect.bisect_right(timeline_bounds, ts) - 1
+    if 0 <= idx < len(timeline):
+        return timeline[idx][2]
+    return None
+
+def next_transition(ts):
+    """Return the epoch of the next segment boundary after `ts`, or None."""
+    idx = bisect.bisect_right(timeline_bounds, ts)
+    return timeline_bounds[idx] if idx < len(timeline_bounds) else None
+
+# ---------------- Player ----------------------------
+def start_vlc():
+    """Launch one long-lived VLC instance controlled over its RC interface."""
+    global vlc_process, vlc_rc
+    if vlc_rc:
+        vlc_rc.close()
+        vlc_rc = None
+    if vlc_process and vlc_process.poll() is None:
         vlc_process.terminate()
+    args = ["--fullscreen", "--loop", "--no-video-title-show",
+            "--extraintf", "rc", "--rc-host", f"{VLC_RC_HOST}:{VLC_RC_PORT}"]
+    if IS_WINDOWS:
+        vlc_path = r"C:\Program Files\VideoLAN\VLC\vlc.exe"
+        vlc_process = subprocess.Popen([vlc_path, "--rc-quiet"] + args)
+    else:
+        vlc_process = subprocess.Popen(["cvlc"] + args)
+
+    # Wait for the RC port to come up
+    deadline = time.time() + 10
+    while True:
+        try:
+            vlc_rc = socket.create_connection((VLC_RC_HOST, VLC_RC_PORT), timeout=2)
+            vlc_rc.settimeout(None)
+            threading.Thread(target=drain_vlc_output, args=(vlc_rc,), name="vlc-rc", daemon=True).start()
+            return
+        except OSError:
+            if time.time() > deadline or vlc_process.poll() is not None:
+                raise
+            time.sleep(0.2)
+
+def drain_vlc_output(conn):
+    """Read and discard RC output so VLC never blocks on a full socket buffer.
+
+    --rc-quiet only exists on Windows; elsewhere VLC echoes prompts and
+    status changes for every command and every playlist loop.
+    """
     try:
-        if IS_WINDOWS:
-            vlc_path = r"C:\Program Files\VideoLAN\VLC\vlc.exe"
-            vlc_process = subprocess.Popen([vlc_path, path, "--fullscreen", "--loop"])
-        else:
-            vlc_process = subprocess.Popen(["cvlc", path, "--fullscreen", "--loop"])
-        print(f"[PLAYING] {os.path.basename(path)}")
-    except Exception as e:
-        print(f"[ERROR] Launching VLC: {e}")
+        while conn.recv(4096):
+            pass
+    except OSError:
+        pass
+
+def vlc_send(*commands):
+    vlc_rc.sendall("".join(f"{cmd}\n" for cmd in commands).encode("utf-8"))
+
+def play_playlist(paths):
+    """Replace VLC's playlist with `paths` and loop it. Returns True on success."""
+    if not paths:
+        return False
+    commands = ["clear", f"add {paths[0]}"] + [f"enqueue {p}" for p in paths[1:]] + ["loop on"]
+    try:
+        if vlc_process is None or vlc_process.poll() is not None or vlc_rc is None:
+            start_vlc()
+        vlc_send(*commands)
+    except OSError:
+        # RC connection dropped; restart VLC once and retry
+        try:
+            start_vlc()
+            vlc_send(*commands)
+        except OSError as e:
+            print(f"[ERROR] Controlling VLC: {e}")
+            record_event("error", detail=f"Controlling VLC: {e}")
+            return False
+    print(f"[PLAYING] {', '.join(os.path.basename(p) for p in paths)}")
+    return True
+
+def switch_playlist(playlist):
+    """Put `playlist` on screen and log proof of play for the one it replaces."""
+    global current_playlist, playlist_started_at
+    if not play_playlist(playlist):
+        return False
+    record_playback(current_playlist, playlist_started_at)
+    current_playlist = playlist
+    playlist_started_at = time.time()
+    return True
 
 # ---------------- Main Loop ---------------------------
 def main():
-    global current_video, last_refresh
+    global last_refresh
     print("[START] Smart Scheduler running...")
+    load_cache_index()
+    threading.Thread(target=prefetch_worker, name="prefetch", daemon=True).start()
+    threading.Thread(target=telemetry_worker, name="telemetry", daemon=True).start()
+
+    load_schedule_store()
+
+    # Resume the stored plan while the backend is contacted
+    cached_default = schedule_store["default_video"]
+    if cached_default and store_is_fresh():
+        cached_default_path = safe_filename(cached_default["title"], cached_default["video_id"])
+        if os.path.exists(cached_default_path):
+            set_timeline(build_timeline(schedule_store["schedules"], cached_default_path))
+            switch_playlist(video_at(time.time()))
 
     default_video_path = fetch_default_video()
     if not default_video_path:
@@ -146,29 +525,35 @@ def main():
 
     # initial schedule load
     schedules = fetch_schedules()
-    generate_schedule_data(schedules, default_video_path)
+    set_timeline(build_timeline(schedules, default_video_path))
     last_refresh = time.time()
 
-    current_video = get_video_for_now()
-    play_video(current_video or default_video_path)
-
     while True:
         now = time.time()
 
-        # refresh every 5 minutes
         if now - last_refresh >= REFRESH_INTERVAL:
-            print("[REFRESH] Updating schedule.json...")
+            print("[REFRESH] Updating timeline...")
             schedules = fetch_schedules()
-            generate_schedule_data(schedules, default_video_path)
-            last_refresh = now
+            set_timeline(build_timeline(schedules, default_video_path))
+            last_refresh = now = time.time()
+        elif wake_event.is_set():
+            # A prefetch finished; rebuild from the schedules we already have
+            wake_event.clear()
+            set_timeline(build_timeline(schedules, default_video_path))
+            now = time.time()
 
-        # check current minute’s plan
-        next_video = get_video_for_now()
-        if next_video and next_video != current_video:
-            current_video = next_video
-            play_video(next_video)
+        next_playlist = video_at(now) or [default_video_path]
+        if next_playlist != current_playlist:
+            switch_playlist(next_playlist)
 
-        time.sleep(CHECK_INTERVAL)
+        # Sleep exactly until the next switch, or until the next refresh
+        wake_at = last_refresh + REFRESH_INTERVAL
+        transition = next_transition(now)
+        if transition is not None:
+            wake_at = min(wake_at, transition)
+        if next_playlist != current_playlist:
+            wake_at = min(wake_at, now + 5)  # VLC not controllable yet; retry soon
+        wake_event.wait(max(0.0, wake_at - time.time()))
 
 if __name__ == "__main__":
     main()
@@ -2,9 +2,15 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 import os
+import time
 from dotenv import load_dotenv
 import click
 from extensions import db
+from utils.presence import presence
+from utils import jobs, otp_store, rate_limit, google_auth, storage, deletions
+from utils.db_routing import configure_replicas
+from utils.background import start_background_tasks
+from utils import metrics, query_budget
 from flask_migrate import Migrate
 from routes.main import bp
 from models.models import User, Device, Video, Schedule
@@ -38,9 +44,19 @@ def create_app(test_config=None):
         pass
 
     # Initialize Flask extensions
+    configure_replicas(app)
     db.init_app(app)
+    metrics.init_app(app, db)
+    query_budget.init_app(app, db)
     jwt = JWTManager(app)
     Migrate(app, db)
+    presence.init_app(app)
+    jobs.init_app(app)
+    otp_store.init_app(app)
+    rate_limit.init_app(app)
+    google_auth.init_app(app)
+    storage.init_app(app)
+    deletions.init_app(app)
 
     # Trust proxy headers (Nginx/ALB)
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1)
@@ -70,6 +86,66 @@ def create_app(test_config=None):
 
     app.cli.add_command(init_db_command)
 
+    @click.command('run-jobs')
+    @click.option('--once', is_flag=True, help='Drain due jobs and exit')
+    def run_jobs_command(once):
+        """Deliver queued email/SMS jobs in the foreground"""
+        worker = jobs.JobWorker(app.config)
+        try:
+            while True:
+                processed = worker.drain()
+                if once:
+                    click.echo(f'Processed {processed} jobs')
+                    return
+                time.sleep(app.config.get("JOB_POLL_SECONDS", 1))
+        finally:
+            worker.close()
+
+    app.cli.add_command(run_jobs_command)
+
+    @click.command('run-deletions')
+    @click.option('--once', is_flag=True, help='Drain due deletions and exit')
+    def run_deletions_command(once):
+        """Delete queued storage objects in the foreground"""
+        worker = deletions.DeletionWorker(app.config.get("STORAGE_DELETE_BATCH_SIZE", deletions.DELETE_BATCH_SIZE))
+        while True:
+            processed = worker.drain()
+            if once:
+                click.echo(f'Processed {processed} deletions')
+                return
+            time.sleep(app.config.get("STORAGE_DELETE_POLL_SECONDS", 10))
+
+    app.cli.add_command(run_deletions_command)
+
+    @click.command('reconcile-storage')
+    @click.option('--prefix', 'prefixes', multiple=True, help='Key prefix to scan (default: videos/ and profiles/)')
+    @click.option('--purge', is_flag=True, help='Queue orphan objects for deletion')
+    @click.option('--purge-rows', is_flag=True, help='Clear or delete DB rows whose objects are missing')
+    @click.option('--min-age-minutes', default=60, show_default=True, help='Ignore objects newer than this')
+    @click.option('--start-after', default=None, help='Resume after this key')
+    @click.option('--continuation-token', default=None, help='Resume from this listing token (with --start-after)')
+    def reconcile_storage_command(prefixes, purge, purge_rows, min_age_minutes, start_after, continuation_token):
+        """Report storage objects and DB rows that have drifted apart"""
+        from datetime import timedelta
+        from utils.reconcile import RECONCILE_PREFIXES, reconcile
+        store = storage.get_storage()
+        if store is None:
+            raise click.ClickException('Cloud storage not configured')
+        counts = reconcile(
+            store,
+            prefixes=prefixes or RECONCILE_PREFIXES,
+            start_after=start_after,
+            continuation_token=continuation_token,
+            min_age=timedelta(minutes=min_age_minutes),
+            purge_objects=purge,
+            purge_rows=purge_rows,
+            report=click.echo,
+        )
+        click.echo(f"Scanned {counts['objects']} objects: {counts['orphan_objects']} orphan objects, "
+                   f"{counts['missing_objects']} rows with missing objects")
+
+    app.cli.add_command(reconcile_storage_command)
+
     # Configure CORS (set CORS_ORIGINS env, comma-separated); default to '*'
     cors_origins = os.getenv("CORS_ORIGINS","*")
     origins_list = [o.strip() for o in cors_origins.split(",") if o.strip()]
@@ -79,7 +155,7 @@ def create_app(test_config=None):
         supports_credentials=True,
         methods=["GET", "POST", "OPTIONS", "PUT", "DELETE"],
         allow_headers=["Content-Type", "Authorization"],
-        expose_headers=["Content-Type", "Authorization"]
+        expose_headers=["Content-Type", "Authorization", "X-Next-Cursor", "X-Device-Ids"]
     )
 
     # Logging (rotating file + stderr) in non-debug
@@ -135,4 +211,5 @@ def create_app(test_config=None):
 
 if __name__ == "__main__":
     app = create_app()
+    start_background_tasks(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
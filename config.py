@@ -32,6 +32,8 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or construct_database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replicas (comma-separated URLs); views marked @read_replica read from them
+    DATABASE_REPLICA_URLS = os.getenv('DATABASE_REPLICA_URLS', '')
     # Engine robustness for long-lived connections (e.g., RDS/ALB)
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_pre_ping": True,
@@ -39,7 +41,7 @@ class Config:
     }
     
     # Google OAuth
-    GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
+    GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')  # also checked as the ID-token audience when set
     GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 
     # jwt token 
@@ -55,3 +57,65 @@ class Config:
         JWT_ACCESS_TOKEN_EXPIRES = False if _jwt_exp.lower() == "false" else timedelta(seconds=int(_jwt_exp))
     JWT_IDENTITY_CLAIM = 'sub'  # Use standard JWT claim name
     JWT_ERROR_MESSAGE_KEY = 'error'  # Key for error messages
+
+    # Background threads, started by wsgi.py: caches and sweepers run in every worker, queue
+    # drains (jobs, deletions, OTP expiry) in one worker per host holding BACKGROUND_LOCK_PATH
+    BACKGROUND_TASKS = os.getenv("BACKGROUND_TASKS", "1") == "1"
+    BACKGROUND_LOCK_PATH = os.getenv("BACKGROUND_LOCK_PATH")  # defaults to instance/background.lock
+    PRESENCE_SWEEP_SECONDS = int(os.getenv("PRESENCE_SWEEP_SECONDS", "15"))
+
+    # Outbound email/SMS, delivered by background job workers
+    SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_EMAIL = os.getenv("SMTP_EMAIL")
+    SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+    TWO_FACTOR_API_KEY = os.getenv("TWO_FACTOR_API_KEY")
+    MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT", "smtp")  # smtp or local
+    SMS_TRANSPORT = os.getenv("SMS_TRANSPORT", "2factor")  # 2factor or local
+    LOCAL_OUTBOX_PATH = os.getenv("LOCAL_OUTBOX_PATH")  # JSON-lines file for the local transport
+    LOCAL_TRANSPORT_DELAY_MS = int(os.getenv("LOCAL_TRANSPORT_DELAY_MS", "0"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # threads per gunicorn worker
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+    JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "10"))
+    JOB_FAILED_RETENTION_DAYS = int(os.getenv("JOB_FAILED_RETENTION_DAYS", "7"))  # failed jobs are then deleted
+    JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", "3600"))
+
+    # OTP store shared by all workers: "db" (otp_codes table) or "sqlite" (local file)
+    OTP_STORE = os.getenv("OTP_STORE", "db")
+    OTP_SQLITE_PATH = os.getenv("OTP_SQLITE_PATH")  # defaults to instance/otp.sqlite3
+    OTP_SWEEP_SECONDS = int(os.getenv("OTP_SWEEP_SECONDS", "60"))
+
+    # Token-bucket rate limits: "sqlite" (shared by workers on a host) or "memory" (each
+    # worker enforces the full limit, so only for a single process)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "sqlite")
+    RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH")  # defaults to instance/rate_limits.sqlite3
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "")  # overrides, e.g. "login=5/minute,fetch-schedules=10/minute"
+
+    # Google sign-in: certs are cached per worker for their Cache-Control max-age
+    GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+
+    # Object storage: "r2" (Cloudflare R2 / S3 API) or "local" (files served from /storage)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "r2")
+    STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT")  # defaults to instance/storage
+    STORAGE_MAX_POOL_CONNECTIONS = int(os.getenv("STORAGE_MAX_POOL_CONNECTIONS", "50"))
+    STORAGE_MAX_ATTEMPTS = int(os.getenv("STORAGE_MAX_ATTEMPTS", "5"))
+    R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
+    R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
+    R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
+    R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
+    PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
+    STORAGE_DELETE_BATCH_SIZE = int(os.getenv("STORAGE_DELETE_BATCH_SIZE", "1000"))  # at most 1000 per call
+    STORAGE_DELETE_POLL_SECONDS = float(os.getenv("STORAGE_DELETE_POLL_SECONDS", "10"))
+
+    # Prometheus metrics at /metrics; METRICS_DIR aggregates gunicorn workers
+    # (defaults to instance/metrics; gunicorn.conf.py clears it when the master starts)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Dev/test query checks: "off", "warn" (log) or "raise" (fail the request)
+    QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off")
+    QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT")) if os.getenv("QUERY_BUDGET_DEFAULT") else None
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
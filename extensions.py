@@ -3,6 +3,7 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import MetaData
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
+from utils.db_routing import RoutingSession
 
 # Define naming convention for constraints
 convention = {
@@ -17,6 +18,7 @@ convention = {
 class Base(DeclarativeBase):
     metadata = MetaData(naming_convention=convention)
 
-db = SQLAlchemy(model_class=Base)
+# RoutingSession sends read-only requests to replicas when DATABASE_REPLICA_URLS is set
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 bcrypt = Bcrypt()
 jwt = JWTManager()
\ No newline at end of file
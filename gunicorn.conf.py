@@ -0,0 +1,18 @@
+"""Gunicorn settings for the container (gunicorn -c backend/gunicorn.conf.py backend.wsgi:app)."""
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+accesslog = "-"
+errorlog = "-"
+
+# Every worker writes its metrics snapshot here and /metrics merges the directory
+METRICS_DIR = os.environ.setdefault(
+    "METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "metrics")
+)
+
+def on_starting(server):
+    """Drop the previous run's per-pid metrics files before any worker starts."""
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
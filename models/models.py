@@ -49,7 +49,7 @@ class Device(db.Model):
     last_fetch_time = db.Column(db.DateTime(timezone=True), nullable=True)
     next_fetch_time = db.Column(db.DateTime(timezone=True), nullable=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.userId'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.userId'), nullable=False, index=True)
 
     schedules = db.relationship("Schedule", backref="device", lazy=True, cascade="all, delete")
 
@@ -104,6 +104,124 @@ class ScheduleVideo(db.Model):
     def __repr__(self):
         return f"<ScheduleVideo {self.video_id} in Group {self.schedule_group_id} at position {self.order_index}>"
 
+# ---------------- DEVICE EVENT MODEL ----------------
+class DeviceEvent(db.Model):
+    """Append-only telemetry log (proof of play, downloads, errors) reported by devices."""
+    __tablename__ = 'device_events'
+    __table_args__ = (
+        db.Index('ix_device_events_device_id_occurred_at', 'device_id', 'occurred_at'),
+        db.UniqueConstraint('device_id', 'event_uid', name='uq_device_events_device_event_uid'),
+    )
+
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('devices.device_id'), nullable=False)
+    event_uid = db.Column(db.String(64), nullable=True)  # device-generated id, dedupes re-sent batches
+    event_type = db.Column(db.String(20), nullable=False)  # play, download, error
+    video_id = db.Column(db.Integer, nullable=True)  # no FK: events outlive deleted videos
+    schedule_group_id = db.Column(db.BigInteger, nullable=True)
+    occurred_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    duration = db.Column(db.Integer, nullable=True)  # seconds on screen, for play events
+    detail = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime(timezone=True), default=now_ist)
+
+    def __repr__(self):
+        return f"<DeviceEvent {self.event_type} Device {self.device_id} at {self.occurred_at}>"
+
+# ---------------- PLAY ROLLUP MODEL ----------------
+class PlayRollup(db.Model):
+    """Proof-of-play totals per video, device and IST day, kept up to date on telemetry ingest."""
+    __tablename__ = 'play_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('video_id', 'device_id', 'day', name='uq_play_rollups_video_device_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    video_id = db.Column(db.Integer, nullable=False)
+    device_id = db.Column(db.Integer, db.ForeignKey('devices.device_id'), nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False)
+    play_count = db.Column(db.Integer, nullable=False, default=0)
+    play_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True), default=now_ist, onupdate=now_ist)
+
+    def __repr__(self):
+        return f"<PlayRollup Video {self.video_id} Device {self.device_id} on {self.day}>"
+
+# ---------------- DEVICE VIDEO STATE MODEL ----------------
+class DeviceVideoState(db.Model):
+    """Download state of one video on one device, upserted from device reports."""
+    __tablename__ = 'device_video_states'
+    __table_args__ = (
+        db.UniqueConstraint('device_id', 'video_id', name='uq_device_video_states_device_video'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('devices.device_id'), nullable=False)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.video_id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="ready")  # ready, failed
+    updated_at = db.Column(db.DateTime(timezone=True), default=now_ist, onupdate=now_ist)
+
+    def __repr__(self):
+        return f"<DeviceVideoState Device {self.device_id} Video {self.video_id}: {self.status}>"
+
+# ---------------- OUTBOUND JOB MODEL ----------------
+class OutboundJob(db.Model):
+    """Durable queue of outbound deliveries (email, SMS) drained by background workers."""
+    __tablename__ = 'outbound_jobs'
+    __table_args__ = (
+        db.Index('ix_outbound_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(20), nullable=False)  # email, sms
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, running, failed; delivered jobs are deleted
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime(timezone=True), nullable=False, default=now_ist)
+    locked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_ist)
+    updated_at = db.Column(db.DateTime(timezone=True), default=now_ist, onupdate=now_ist)
+
+    def __repr__(self):
+        return f"<OutboundJob {self.job_id} {self.kind} ({self.status})>"
+
+# ---------------- STORAGE DELETION MODEL ----------------
+class StorageDeletion(db.Model):
+    """Outbox of storage objects to delete, drained in batches after the DB rows are gone."""
+    __tablename__ = 'storage_deletions'
+    __table_args__ = (
+        db.Index('ix_storage_deletions_status_run_after', 'status', 'run_after'),
+    )
+
+    deletion_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    object_key = db.Column(db.String(1024), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, running, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime(timezone=True), nullable=False, default=now_ist)
+    locked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_ist)
+
+    def __repr__(self):
+        return f"<StorageDeletion {self.deletion_id} {self.object_key} ({self.status})>"
+
+# ---------------- OTP CODE MODEL ----------------
+class OtpCode(db.Model):
+    """Pending one-time passwords, keyed by email so every worker sees the same code."""
+    __tablename__ = 'otp_codes'
+
+    key = db.Column(db.String(100), primary_key=True)
+    otp = db.Column(db.String(10), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    mobile = db.Column(db.String(15), nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_ist)
+
+    def __repr__(self):
+        return f"<OtpCode {self.key}>"
+
 # ---------------- NEW DEVICES MODEL ----------------
 class New_Devices(db.Model):
     __tablename__ = 'newdevices'
@@ -3,19 +3,19 @@ from flask import Blueprint, request, jsonify
 from extensions import db
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models.models import User
-import google.auth.transport.requests
-import google.oauth2.id_token
 from datetime import datetime, timedelta, timezone
 from utils.timezone import IST, now_ist, ensure_ist
 import random
 from werkzeug.security import generate_password_hash, check_password_hash
-import smtplib
-from email.mime.text import MIMEText
+from utils.jobs import queue_email, queue_sms_otp
+from utils.otp_store import get_otp_store
+from utils.rate_limit import rate_limit, json_field
+from utils.google_auth import verify_google_id_token
+from utils.storage import get_storage, build_public_url, extract_object_key, unique_object_key
+from utils.deletions import enqueue_deletion
 import os
 from dotenv import load_dotenv
-import boto3
 from werkzeug.utils import secure_filename
-import requests
 
 # centralized IST helpers imported above
 
@@ -29,6 +29,7 @@ def send_sms(phone_number, message, shortenurl=True):
     Returns:
         dict: API response
     """
+    import requests
     api_key = os.getenv('TWO_FACTOR_API_KEY')
     if not api_key:
         raise ValueError("TWO_FACTOR_API_KEY not found in environment variables")
@@ -62,69 +63,25 @@ def ping():
 
 
 # ---------------------------- OTP STORAGE ----------------------------
-otp_storage = {}
+# Codes live in the shared OTP store (utils.otp_store), not in worker memory
 OTP_EXPIRY_MINUTES = 5
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-SMTP_SENDER = os.getenv("SMTP_EMAIL")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-
-# Cloudflare R2 configuration (optional env overrides)
 load_dotenv()
-R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
-R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
-R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
-R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
-PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
-
-if R2_ACCOUNT_ID and R2_ACCESS_KEY_ID and R2_SECRET_ACCESS_KEY and R2_BUCKET_NAME:
-    R2_ENDPOINT_URL = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
-    s3_client = boto3.client(
-        "s3",
-        endpoint_url=R2_ENDPOINT_URL,
-        aws_access_key_id=R2_ACCESS_KEY_ID,
-        aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-    )
-else:
-    s3_client = None
-
-# ============================= Helper: Send Email =============================
-def send_email(recipient, subject, body):
-    msg = MIMEText(body)
-    msg["Subject"] = subject
-    msg["From"] = SMTP_SENDER
-    msg["To"] = recipient
-
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_SENDER, SMTP_PASSWORD)
-        server.send_message(msg)
 
 # ============================= Helper: OTP =============================
-def generate_and_store_otp(email):
+def generate_and_store_otp(email, mobile=None):
     otp = random.randint(100000, 999999)
-    otp_storage[email] = {
-        "otp": otp,
-        "expires": now_ist() + timedelta(minutes=OTP_EXPIRY_MINUTES)
-    }
+    get_otp_store().put(email, otp, OTP_EXPIRY_MINUTES * 60, mobile=mobile)
     print(f"[{now_ist()}] OTP {otp} generated for {email}")
     return otp
 
 def validate_otp(email, otp):
-    if email not in otp_storage:
-        return "OTP not requested"
-    record = otp_storage[email]
-    if now_ist() > record["expires"]:
-        otp_storage.pop(email, None)
-        return "OTP expired"
-    if int(otp) != record["otp"]:
-        return "Invalid OTP"
-    otp_storage.pop(email, None)
-    return None  # valid
+    return get_otp_store().verify(email, otp)  # None when valid
 
 # ============================= Login =============================
 @auth_bp.route("/login", methods=["POST", "OPTIONS"])
+@rate_limit("login-ip", "30/minute")
+@rate_limit("login", "10/minute", key=json_field("email"))
 def login():
     if request.method == "OPTIONS":
         return '', 204
@@ -158,9 +115,7 @@ def google_login():
 
     token = request.json.get("token")
     try:
-        id_info = google.oauth2.id_token.verify_oauth2_token(
-            token, google.auth.transport.requests.Request()
-        )
+        id_info = verify_google_id_token(token)
         email = id_info.get("email")
         google_id = id_info.get("sub")
         name = id_info.get("name", "Google User")
@@ -233,6 +188,7 @@ def get_user(user_id):
 
 
 @auth_bp.route("/signup", methods=["POST", "OPTIONS"])
+@rate_limit("signup", "5/minute")
 def signup():
     if request.method == "OPTIONS":
         return '', 204
@@ -252,12 +208,9 @@ def signup():
     hashed_pw = generate_password_hash(password)
 
     # ----- Generate one common OTP -----
-    otp = random.randint(100000, 999999)
-    expiry_time = now_ist() + timedelta(minutes=OTP_EXPIRY_MINUTES)
-    otp_storage[email] = {"otp": otp, "expires": expiry_time, "mobile": mobile_number}
-    print(f"[{now_ist()}] OTP {otp} generated for {email} / {mobile_number}")
+    otp = generate_and_store_otp(email, mobile=mobile_number)
 
-    # ----- Send OTP to Email -----
+    # ----- Queue OTP to Email and Mobile (delivered by the job workers) -----
     try:
         subject = "Verify Your Account"
         body = (
@@ -265,22 +218,13 @@ def signup():
             f"Your OTP for account verification is: {otp}\n"
             f"It is valid for {OTP_EXPIRY_MINUTES} minutes."
         )
-        send_email(email, subject, body)
-    except Exception as e:
-        print("SMTP Error:", e)
-        return jsonify({"error": "Failed to send email OTP"}), 500
-
-    # ----- Send OTP to Mobile using 2Factor -----
-    try:
-        url = f"https://2factor.in/API/V1/{TWO_FACTOR_API_KEY}/SMS/{mobile_number}/{otp}"
-        response = requests.get(url)
-        res_data = response.json()
-        if res_data.get("Status") != "Success":
-            print("2Factor Error:", res_data)
-            return jsonify({"error": "Failed to send mobile OTP"}), 500
+        queue_email(email, subject, body)
+        queue_sms_otp(mobile_number, otp)
+        db.session.commit()
     except Exception as e:
-        print("2Factor API Error:", e)
-        return jsonify({"error": "Failed to send SMS OTP"}), 500
+        db.session.rollback()
+        print("OTP queue Error:", e)
+        return jsonify({"error": "Failed to send OTP"}), 500
 
     # ----- Success -----
     return jsonify({
@@ -297,6 +241,8 @@ def signup():
 
 # ============================= Verify Signup OTP =============================
 @auth_bp.route("/verify-signup-otp", methods=["POST"])
+@rate_limit("verify-signup-otp-ip", "30/minute")
+@rate_limit("verify-signup-otp", "10/minute", key=json_field("email"))
 def verify_signup_otp():
     data = request.get_json()
     email = data.get("email")
@@ -329,6 +275,8 @@ def verify_signup_otp():
 
 # ============================= Forgot Password =============================
 @auth_bp.route("/forgot-password", methods=["POST"])
+@rate_limit("forgot-password-ip", "10/minute")
+@rate_limit("forgot-password", "3/minute", key=json_field("email"))
 def forgot_password():
     data = request.get_json()
     email = data.get("email")
@@ -348,14 +296,18 @@ def forgot_password():
             f"Your OTP for password reset is: {otp}\n"
             f"It is valid for {OTP_EXPIRY_MINUTES} minutes."
         )
-        send_email(email, subject, body)
+        queue_email(email, subject, body)
+        db.session.commit()
         return jsonify({"message": "OTP sent to your email"}), 200
     except Exception as e:
-        print("SMTP Error:", e)
+        db.session.rollback()
+        print("OTP queue Error:", e)
         return jsonify({"error": "Failed to send OTP"}), 500
 
 # ============================= Verify OTP =============================
 @auth_bp.route("/verify-otp", methods=["POST"])
+@rate_limit("verify-otp-ip", "30/minute")
+@rate_limit("verify-otp", "10/minute", key=json_field("email"))
 def verify_otp():
     data = request.get_json()
     email = data.get("email")
@@ -387,7 +339,7 @@ def reset_password():
     user.password = generate_password_hash(new_password)
     db.session.commit()
 
-    otp_storage.pop(email, None)
+    get_otp_store().discard(email)
     return jsonify({"message": "Password reset successful"}), 200
 
 
@@ -396,7 +348,8 @@ def reset_password():
 @jwt_required()
 def upload_profile_photo():
     """Upload a profile photo to Cloudflare R2 and save the public URL to the user record."""
-    if s3_client is None:
+    storage = get_storage()
+    if storage is None:
         return jsonify({"error": "Cloud storage not configured"}), 500
 
     try:
@@ -410,18 +363,16 @@ def upload_profile_photo():
         if not filename or '.' not in filename or filename.rsplit('.', 1)[1].lower() not in ALLOWED_IMG:
             return jsonify({"error": "Invalid file type"}), 400
 
-        object_key = f"profiles/{user_id}/{filename}"
+        object_key = unique_object_key(f"profiles/{user_id}", filename)
 
-        s3_client.upload_fileobj(
-            file,
-            R2_BUCKET_NAME,
-            object_key,
-            ExtraArgs={"ContentType": file.content_type}
-        )
+        storage.upload(file, object_key, content_type=file.content_type)
 
-        photo_url = f"{PUBLIC_BASE_URL}/{object_key}" if PUBLIC_BASE_URL else None
+        photo_url = build_public_url(object_key)
 
         user = User.query.get_or_404(user_id)
+        # The replaced photo is removed by the storage deleter once this commits
+        if user.profile_photo_url:
+            enqueue_deletion(extract_object_key(user.profile_photo_url))
         user.profile_photo_url = photo_url
         db.session.commit()
 
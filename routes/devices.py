@@ -1,7 +1,7 @@
-import uuid, json
+import uuid, json, hashlib
 from datetime import datetime, timedelta, timezone
 from utils.timezone import IST, now_ist, ensure_ist
-from flask import Blueprint, jsonify, request, current_app, send_file
+from flask import Blueprint, jsonify, request, current_app, send_file, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from models.models import Device, Video
 from models.models import New_Devices
@@ -10,6 +10,14 @@ from werkzeug.utils import secure_filename
 import os
 import io
 from models.models import User
+from sqlalchemy import case, func
+from sqlalchemy.orm import load_only
+from utils.pagination import page_args, field_args, set_next_cursor
+from utils.presence import presence, DEVICE_LIVENESS_SECONDS, FETCH_INTERVAL
+from utils.rate_limit import rate_limit, json_field
+from utils.db_routing import read_replica, use_primary
+from utils.metrics import record_cache
+from utils.query_budget import query_budget
 
 devices_bp = Blueprint('devices', __name__)
 
@@ -72,7 +80,15 @@ def create_device():
 
 #----------------- Download config file ------------------------------------
 
-import zipfile
+from utils.device_package import package_template, stream_archive
+
+def package_config(device):
+    return {
+        "backend_url": request.host_url.rstrip('/'),
+        "device_code": device.device_code,
+        "device_token": device.device_token,
+        "api_version": "1.0"
+    }
 
 @devices_bp.route('/<int:device_id>/download-config', methods=['GET'])
 @jwt_required()
@@ -83,42 +99,16 @@ def download_device_config(device_id):
         if not device:
             return jsonify({"error": "Device not found"}), 404
 
-        # Prepare device-specific config
-        config = {
-            "backend_url": request.host_url.rstrip('/'),
-            "device_code": device.device_code,
-            "device_token": device.device_token,
-            "api_version": "1.0"
-        }
-
-        # Server-friendly Python file path
-        python_file_path = os.path.join(os.path.dirname(__file__), "..", "PI", "device_app.py")
-        python_file_path = os.path.abspath(python_file_path)
-        print(f"[INFO] Reading Python file from: {python_file_path}")
+        config = package_config(device)
 
-        if not os.path.exists(python_file_path):
-            return jsonify({"error": f"Python file not found at {python_file_path}"}), 500
-
-        # Read Python file as text
-        with open(python_file_path, "r", encoding="utf-8") as f:
-            python_code = f.read()
-
-        # Start scripts
-        start_sh = "#!/bin/bash\npython3 device_app.py\n"
-        start_bat = "@echo off\npython device_app.py\npause\n"
-
-        # Create in-memory ZIP
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.writestr("config.json", json.dumps(config, indent=2))
-            zip_file.writestr("device_app.py", python_code)
-            zip_file.writestr("start.sh", start_sh)
-            zip_file.writestr("start.bat", start_bat)
-
-        zip_buffer.seek(0)
+        # Cached, precompressed device_app.py + start scripts, stamped with this config
+        try:
+            package = package_template.package(config)
+        except FileNotFoundError:
+            return jsonify({"error": f"Python file not found at {package_template.app_path}"}), 500
 
         return send_file(
-            zip_buffer,
+            io.BytesIO(package),
             mimetype='application/zip',
             as_attachment=True,
             download_name=f"device_{device.device_code}_package.zip"
@@ -129,6 +119,83 @@ def download_device_config(device_id):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+#----------------- Bulk provisioning ------------------------------------
+
+from sqlalchemy import insert as sa_insert
+
+BULK_CREATE_MAX = 500
+
+def safe_device_code(name):
+    return "".join(c for c in name.strip() if c.isalnum() or c in ('-', '_'))
+
+@devices_bp.route('/bulk-create', methods=['POST'])
+@jwt_required()
+def bulk_create_devices():
+    """Create many devices with one INSERT and stream back a ZIP of their packages.
+
+    Body: {"names": [...]} or {"prefix": "lobby", "count": 50} (codes
+    lobby-001 ... lobby-050). The archive holds one
+    device_<code>_package.zip per device, the same package download-config returns.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    if data.get("names") is not None:
+        names = data["names"]
+        if not isinstance(names, list):
+            return jsonify({"error": "names must be a list"}), 400
+        if len(names) > BULK_CREATE_MAX:
+            return jsonify({"error": f"At most {BULK_CREATE_MAX} devices per request"}), 400
+        codes = [safe_device_code(str(n)) for n in names]
+    else:
+        prefix = safe_device_code(str(data.get("prefix", "")))
+        try:
+            count = int(data.get("count", 0))
+        except (TypeError, ValueError):
+            return jsonify({"error": "count must be an integer"}), 400
+        if not prefix:
+            return jsonify({"error": "names or prefix is required"}), 400
+        if not 1 <= count <= BULK_CREATE_MAX:
+            return jsonify({"error": f"count must be between 1 and {BULK_CREATE_MAX}"}), 400
+        width = max(3, len(str(count)))
+        codes = [f"{prefix}-{i:0{width}d}" for i in range(1, count + 1)]
+
+    if not codes or not all(codes):
+        return jsonify({"error": "Device names are required"}), 400
+    if len(set(codes)) != len(codes):
+        return jsonify({"error": "Device names must be unique"}), 400
+
+    existing = [c for (c,) in db.session.query(Device.device_code).filter(Device.device_code.in_(codes))]
+    if existing:
+        return jsonify({"error": "Device code already exists", "device_codes": sorted(existing)}), 400
+
+    now = now_ist()
+    rows = [
+        {"device_code": code, "device_token": uuid.uuid4().hex, "user_id": user_id,
+         "status": "inactive", "playback_state": "stopped", "created_at": now, "updated_at": now}
+        for code in codes
+    ]
+    try:
+        db.session.execute(sa_insert(Device), rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to create devices: {str(e)}"}), 500
+
+    ids = dict(db.session.query(Device.device_code, Device.device_id).filter(Device.device_code.in_(codes)))
+    backend_url = request.host_url.rstrip('/')
+    configs = [
+        {"backend_url": backend_url, "device_code": r["device_code"],
+         "device_token": r["device_token"], "api_version": "1.0"}
+        for r in rows
+    ]
+    members = (
+        (f"device_{c['device_code']}_package.zip", package_template.package(c)) for c in configs
+    )
+    response = Response(stream_archive(members), mimetype='application/zip')
+    response.headers["Content-Disposition"] = f'attachment; filename="devices_{len(rows)}_packages.zip"'
+    response.headers["X-Device-Ids"] = ",".join(str(ids[code]) for code in codes)
+    return response, 201
+
 @devices_bp.route('/register', methods=['POST'])
 def register_device():
     data = request.json
@@ -178,89 +245,182 @@ def update_device_status():
 
 
 
+def iso_ist(dt):
+    return ensure_ist(dt).isoformat() if dt else None
+
+# API field -> (Device columns it needs, serializer taking the device and current videos by id)
+DEVICE_LIST_FIELDS = {
+    "device_id": (("device_id",), lambda d, videos: d.device_id),
+    "device_code": (("device_code",), lambda d, videos: d.device_code),
+    "status": (("last_fetch_time",), lambda d, videos: "active" if presence.is_active(d.device_id, d.last_fetch_time) else "inactive"),
+    "last_seen": (("last_fetch_time",), lambda d, videos: iso_ist(presence.last_seen(d.device_id, d.last_fetch_time))),
+    "last_fetch_time": (("last_fetch_time",), lambda d, videos: iso_ist(presence.last_seen(d.device_id, d.last_fetch_time))),
+    "next_fetch_time": (("next_fetch_time",), lambda d, videos: iso_ist(d.next_fetch_time)),
+    "playback_state": (("playback_state",), lambda d, videos: d.playback_state),
+    "current_video": (("current_video_id",), lambda d, videos: videos.get(d.current_video_id)),
+}
+
 @devices_bp.route('/list', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def list_devices():
+    """List the user's devices ordered by id.
+
+    Optional `limit`/`cursor` page through the list (next page cursor in the
+    X-Next-Cursor header) and `fields=` selects which keys, and columns, load.
+    """
     try:
         user_id = int(get_jwt_identity())
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid user ID"}), 422
 
+    try:
+        limit, cursor = page_args(request.args)
+        fields = field_args(request.args, DEVICE_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     user = User.query.filter_by(userId=user_id).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    devices = Device.query.filter_by(user_id=user.userId).all()
+    columns = {"device_id"}
+    for f in fields:
+        columns.update(DEVICE_LIST_FIELDS[f][0])
+    query = (
+        Device.query.options(load_only(*[getattr(Device, c) for c in columns]))
+        .filter_by(user_id=user.userId)
+        .order_by(Device.device_id.asc())
+    )
+    if cursor is not None:
+        if not isinstance(cursor, int):
+            return jsonify({"error": "Invalid cursor"}), 400
+        query = query.filter(Device.device_id > cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    devices = query.all()
     if not devices:
         return jsonify({"devices": []}), 200
 
-    # Current IST-aware time
-    now = now_ist()
-    device_list = []
-
-    for d in devices:
-        last_seen = d.last_fetch_time
-        if last_seen:
-            # make sure last_seen is IST-aware
-            last_seen = ensure_ist(last_seen)
-        
-        is_active = (now - last_seen).total_seconds() < 180 if last_seen else False
-        new_status = "active" if is_active else "inactive"
-
-        if d.status != new_status:
-            d.status = new_status
-            db.session.commit()
-
-        current_video = None
-        if d.current_video_id:
-            video = Video.query.filter_by(video_id=d.current_video_id).first()
-            if video:
-                current_video = {
+    current_videos = {}
+    if "current_video" in fields:
+        video_ids = {d.current_video_id for d in devices if d.current_video_id}
+        if video_ids:
+            for video in Video.query.filter(Video.video_id.in_(video_ids)):
+                current_videos[video.video_id] = {
                     "video_id": video.video_id,
                     "title": video.title,
                     "description": video.description,
                     "video_link": video.video_link,
                 }
 
-        device_list.append({
-            "device_id": d.device_id,
-            "device_code": d.device_code,
-            "status": d.status,
-            "last_seen": last_seen.isoformat() if last_seen else None,
-            "last_fetch_time": ensure_ist(getattr(d, 'last_fetch_time', None)).isoformat() if getattr(d, 'last_fetch_time', None) else None,
-            "next_fetch_time": ensure_ist(getattr(d, 'next_fetch_time', None)).isoformat() if getattr(d, 'next_fetch_time', None) else None,
-            "playback_state": d.playback_state,
-            "current_video": current_video or None
-        })
+    # Status comes from the presence registry; the sweeper persists transitions
+    device_list = [{f: DEVICE_LIST_FIELDS[f][1](d, current_videos) for f in fields} for d in devices]
 
+    return set_next_cursor(
+        jsonify({"devices": device_list}), devices, limit, lambda d: d.device_id
+    ), 200
 
-    return jsonify({"devices": device_list}), 200
+# Heartbeat age buckets for the summary, as (label, max age in seconds), youngest first
+HEARTBEAT_BUCKETS = [
+    ("live", DEVICE_LIVENESS_SECONDS),
+    ("under_15m", 15 * 60),
+    ("under_1h", 60 * 60),
+    ("under_24h", 24 * 60 * 60),
+]
+
+@devices_bp.route('/summary', methods=['GET'])
+@jwt_required()
+def devices_summary():
+    """Fleet counts by status, playback state and heartbeat age from one GROUP BY query."""
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid user ID"}), 422
+
+    now = now_ist()
+    bucket = case(
+        (Device.last_fetch_time.is_(None), "never"),
+        *[
+            (Device.last_fetch_time >= now - timedelta(seconds=max_age), label)
+            for label, max_age in HEARTBEAT_BUCKETS
+        ],
+        else_="over_24h",
+    ).label("bucket")
+
+    rows = (
+        db.session.query(bucket, Device.playback_state, func.count(Device.device_id))
+        .filter(Device.user_id == user_id)
+        .group_by("bucket", Device.playback_state)
+        .all()
+    )
+
+    by_status = {"active": 0, "inactive": 0}
+    by_playback_state = {}
+    heartbeat_age = {label: 0 for label, _ in HEARTBEAT_BUCKETS}
+    heartbeat_age.update(over_24h=0, never=0)
+    for bucket_label, playback_state, count in rows:
+        by_status["active" if bucket_label == "live" else "inactive"] += count
+        state = playback_state or "stopped"
+        by_playback_state[state] = by_playback_state.get(state, 0) + count
+        heartbeat_age[bucket_label] += count
+
+    # What live screens are playing right now
+    playing = (
+        db.session.query(Video.video_id, Video.title, func.count(Device.device_id))
+        .join(Device, Device.current_video_id == Video.video_id)
+        .filter(
+            Device.user_id == user_id,
+            Device.playback_state == "playing",
+            Device.last_fetch_time >= now - timedelta(seconds=DEVICE_LIVENESS_SECONDS),
+        )
+        .group_by(Video.video_id, Video.title)
+        .order_by(func.count(Device.device_id).desc())
+        .all()
+    )
+
+    return jsonify({
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_playback_state": by_playback_state,
+        "heartbeat_age": heartbeat_age,
+        "playing_videos": [
+            {"video_id": video_id, "title": title, "devices": count}
+            for video_id, title, count in playing
+        ],
+        "generated_at": now.isoformat(),
+    }), 200
 
 #------------------------------ API FOR PI -------------------------------------
 
-from models.models import Schedule, ScheduleVideo, Device, Video
+from models.models import Schedule, ScheduleVideo, Device, Video, DeviceVideoState
 from extensions import db
 from datetime import datetime, timedelta, timezone
+from utils.upsert import upsert
 
 # IST helpers are imported from utils.timezone at module top
 
 @devices_bp.route("/fetch-schedules", methods=["POST"])
+@rate_limit("fetch-schedules", "20/minute", key=json_field("device_token"))
+@read_replica
+@query_budget(6)
 def fetch_schedules():
     data = request.json
     device_token = data.get("device_token")
 
     device = Device.query.filter_by(device_token=device_token).first()
+    if not device:
+        # A just-provisioned device may not have reached the replica yet
+        use_primary()
+        device = Device.query.filter_by(device_token=device_token).first()
     if not device:
         return jsonify({"error": "Invalid device token"}), 401
 
     # Get current IST time (timezone-aware)
     now_aware = now_ist()
 
-    # Update in DB with IST-aware timestamps
-    device.status = "active"
-    device.last_fetch_time = now_aware
-    device.next_fetch_time = now_aware + timedelta(minutes=3)
-    db.session.commit()
+    # Heartbeat is kept in memory; the presence sweeper writes it in batches
+    presence.heartbeat(device.device_id, now_aware)
     # Fetch schedules within the next 12 hours (IST-based)
     next_12h_aware = now_aware + timedelta(hours=12)
 
@@ -275,25 +435,36 @@ def fetch_schedules():
         .all()
     )
 
-    result = []
-    for sch in schedules:
-        videos = (
-            ScheduleVideo.query
-            .filter_by(schedule_group_id=sch.schedule_group_id)
-            .join(Video)
-            .order_by(ScheduleVideo.order_index.asc())
-            .all()
+    ready_video_ids = {
+        video_id for (video_id,) in db.session.query(DeviceVideoState.video_id).filter_by(
+            device_id=device.device_id, status="ready"
         )
+    }
 
-        video_list = []
-        for sv in videos:
-            video_list.append({
-                "video_id": sv.video_id,
-                "title": sv.video.title,
-                "video_link": sv.video.video_link,
-                "download_status": False  
+    # Videos of every group in one query instead of one per schedule
+    videos_by_group = {}
+    group_ids = {sch.schedule_group_id for sch in schedules}
+    if group_ids:
+        rows = (
+            db.session.query(ScheduleVideo.schedule_group_id, ScheduleVideo.video_id,
+                             ScheduleVideo.order_index, Video.title, Video.video_link)
+            .join(Video, Video.video_id == ScheduleVideo.video_id)
+            .filter(ScheduleVideo.schedule_group_id.in_(group_ids))
+            .order_by(ScheduleVideo.schedule_group_id, ScheduleVideo.order_index.asc())
+        )
+        for group_id, video_id, order_index, title, video_link in rows:
+            videos_by_group.setdefault(group_id, []).append({
+                "video_id": video_id,
+                "title": title,
+                "video_link": video_link,
+                "order_index": order_index,
+                "download_status": video_id in ready_video_ids
             })
 
+    result = []
+    for sch in schedules:
+        video_list = videos_by_group.get(sch.schedule_group_id, [])
+
         result.append({
             "schedule_id": sch.schedule_id,
             "schedule_group_id": sch.schedule_group_id,
@@ -302,41 +473,73 @@ def fetch_schedules():
             "videos": video_list
         })
 
+    # Validator over the schedule payload only (fetch_info changes on every call)
+    etag = hashlib.sha1(json.dumps(result, sort_keys=True, default=str).encode()).hexdigest()
+    not_modified = request.if_none_match.contains(etag)
+    record_cache("schedules_etag", not_modified)
+    if not_modified:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
     # Return schedules + IST times (formatted)
-    return jsonify({
+    response = jsonify({
         "schedules": result,
         "fetch_info": {
             "last_fetch_time": now_aware.strftime("%Y-%m-%d %H:%M:%S"),
-            "next_fetch_time": (now_aware + timedelta(minutes=3)).strftime("%Y-%m-%d %H:%M:%S")
+            "next_fetch_time": (now_aware + FETCH_INTERVAL).strftime("%Y-%m-%d %H:%M:%S")
         }
     })
+    response.set_etag(etag)
+    return response
+
 
 
+DOWNLOAD_STATES = {"ready", "failed"}
 
 @devices_bp.route("/update-download-status", methods=["POST"])
+@rate_limit("update-download-status", "120/minute", key=json_field("device_token"))
 def update_download_status():
-    data = request.json
+    """Record download state for one video, or a batch under "videos", with one bulk upsert."""
+    data = request.get_json(silent=True) or {}
     device_token = data.get("device_token")
-    video_id = data.get("video_id")
-    schedule_group_id = data.get("schedule_group_id")
 
     device = Device.query.filter_by(device_token=device_token).first()
     if not device:
         return jsonify({"error": "Invalid device token"}), 401
 
-    sv = ScheduleVideo.query.join(Schedule).filter(
-        Schedule.device_id == device.device_id,
-        ScheduleVideo.video_id == video_id,
-        ScheduleVideo.schedule_group_id == schedule_group_id
-    ).first()
-
-    if sv:
-        sv.download_status = True
-        db.session.commit()
+    reports = data.get("videos")
+    if reports is None:
+        reports = [{"video_id": data.get("video_id"), "status": data.get("status", "ready")}]
+    if not isinstance(reports, list):
+        return jsonify({"error": "videos must be a list"}), 400
+
+    states = {}
+    for report in reports:
+        try:
+            video_id = int(report["video_id"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Each report needs a numeric video_id"}), 400
+        status = report.get("status", "ready")
+        if status not in DOWNLOAD_STATES:
+            return jsonify({"error": f"Invalid status '{status}'"}), 400
+        states[video_id] = status
+
+    # Ignore reports for videos that no longer exist
+    existing = {
+        video_id for (video_id,) in db.session.query(Video.video_id).filter(Video.video_id.in_(states))
+    }
+    now = now_ist()
+    upsert(DeviceVideoState, [
+        {"device_id": device.device_id, "video_id": video_id, "status": status, "updated_at": now}
+        for video_id, status in states.items() if video_id in existing
+    ], index_elements=("device_id", "video_id"), overwrite=("status", "updated_at"))
+    db.session.commit()
 
-    return jsonify({"message": "Download status updated"})
+    return jsonify({"message": "Download status updated", "updated": len(existing)})
 
 @devices_bp.route("/update-playback", methods=["POST"])
+@rate_limit("update-playback", "30/minute", key=json_field("device_token"))
 def update_playback():
     try:
         data = request.get_json(force=True)
@@ -370,3 +573,130 @@ def update_playback():
         "device_code": device.device_code,
         "last_seen": device.last_seen.isoformat()
     }), 200
+
+#------------------------------ TELEMETRY -------------------------------------
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models.models import DeviceEvent, PlayRollup
+from utils.proof_of_play import parse_day_range, play_report
+
+TELEMETRY_EVENT_TYPES = {"play", "download", "error"}
+MAX_TELEMETRY_BATCH = 1000
+
+def rollup_play_events(rows, updated_at):
+    """Aggregate play event rows into PlayRollup increments keyed by video, device and IST day."""
+    totals = {}
+    for row in rows:
+        if row["event_type"] != "play" or row["video_id"] is None:
+            continue
+        key = (row["video_id"], row["device_id"], row["occurred_at"].date())
+        count, seconds = totals.get(key, (0, 0))
+        totals[key] = (count + 1, seconds + (row["duration"] or 0))
+    return [
+        {"video_id": video_id, "device_id": device_id, "day": day,
+         "play_count": count, "play_seconds": seconds, "updated_at": updated_at}
+        for (video_id, device_id, day), (count, seconds) in totals.items()
+    ]
+
+def drop_seen_events(device_id, rows):
+    """Remove rows whose event id was already stored for the device, or repeats within the batch."""
+    uids = {row["event_uid"] for row in rows if row["event_uid"] is not None}
+    seen = set()
+    if uids:
+        seen = {uid for (uid,) in db.session.query(DeviceEvent.event_uid)
+                .filter(DeviceEvent.device_id == device_id, DeviceEvent.event_uid.in_(uids))}
+    fresh = []
+    for row in rows:
+        if row["event_uid"] is not None:
+            if row["event_uid"] in seen:
+                continue
+            seen.add(row["event_uid"])
+        fresh.append(row)
+    return fresh, len(rows) - len(fresh)
+
+@devices_bp.route("/telemetry", methods=["POST"])
+@rate_limit("telemetry", "30/minute", key=json_field("device_token"))
+def ingest_telemetry():
+    """Bulk-insert a batch of device events in a single transaction.
+
+    Play events are also folded into the per video/device/day rollups in the
+    same transaction, so reports never need to scan the raw log. Events carry
+    a device-generated `id`; ids already stored for the device are skipped,
+    so a batch re-sent after a lost response is not counted twice.
+    """
+    data = request.get_json(silent=True) or {}
+    token = data.get("device_token")
+    events = data.get("events")
+
+    if not token:
+        return jsonify({"error": "Missing device_token"}), 400
+    if not isinstance(events, list):
+        return jsonify({"error": "events must be a list"}), 400
+    if len(events) > MAX_TELEMETRY_BATCH:
+        return jsonify({"error": f"At most {MAX_TELEMETRY_BATCH} events per batch"}), 413
+
+    device = Device.query.filter_by(device_token=token).first()
+    if not device:
+        return jsonify({"error": "Invalid device token"}), 401
+
+    received_at = now_ist()
+    rows = []
+    rejected = 0
+    for ev in events:
+        try:
+            event_type = ev["type"]
+            if event_type not in TELEMETRY_EVENT_TYPES:
+                raise ValueError(event_type)
+            duration = int(ev["duration"]) if ev.get("duration") is not None else None
+            if duration is not None and duration < 0:
+                raise ValueError(duration)
+            event_uid = str(ev["id"])[:64] if ev.get("id") is not None else None
+            rows.append({
+                "device_id": device.device_id,
+                "event_uid": event_uid,
+                "event_type": event_type,
+                "video_id": int(ev["video_id"]) if ev.get("video_id") is not None else None,
+                "schedule_group_id": int(ev["schedule_group_id"]) if ev.get("schedule_group_id") is not None else None,
+                "occurred_at": ensure_ist(datetime.fromisoformat(ev["ts"])),
+                "duration": duration,
+                "detail": str(ev["detail"])[:2000] if ev.get("detail") is not None else None,
+                "received_at": received_at,
+            })
+        except (KeyError, TypeError, ValueError):
+            rejected += 1
+
+    rows, duplicates = drop_seen_events(device.device_id, rows)
+    if rows:
+        db.session.execute(insert(DeviceEvent), rows)
+        upsert(PlayRollup, rollup_play_events(rows, received_at),
+               index_elements=("video_id", "device_id", "day"),
+               increment=("play_count", "play_seconds"), overwrite=("updated_at",))
+    device.last_seen = received_at
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same batch is being ingested concurrently; the device retries later
+        db.session.rollback()
+        return jsonify({"error": "Batch already being processed, retry later"}), 409
+
+    return jsonify({"accepted": len(rows), "rejected": rejected, "duplicates": duplicates}), 200
+
+@devices_bp.route("/<int:device_id>/proof-of-play", methods=["GET"])
+@jwt_required()
+def device_proof_of_play(device_id):
+    """Plays and screen time on one device per video and per day, read from the rollups."""
+    user_id = int(get_jwt_identity())
+    device = Device.query.filter_by(device_id=device_id, user_id=user_id).first()
+    if not device:
+        return jsonify({"error": "Device not found"}), 404
+
+    try:
+        start, end = parse_day_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {e}"}), 400
+
+    report = play_report(start, end, "video_id", "videos", device_id=device.device_id)
+    report["device_id"] = device.device_id
+    return jsonify(report), 200
+
@@ -3,9 +3,11 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta, timezone
 from utils.timezone import IST, now_ist, ensure_ist
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.models import Schedule, Video, Device, ScheduleVideo
+from models.models import Schedule, Video, Device, ScheduleVideo, DeviceVideoState
+from sqlalchemy import and_, delete, insert, select
 from extensions import db
 import random
+from utils.query_budget import query_budget
 
 # using centralized IST helpers
 
@@ -59,6 +61,7 @@ def create_schedule_api():
 
 @schedules_bp.route('/create-multiple', methods=['POST'])
 @jwt_required()
+@query_budget(6)
 def create_multiple_schedules():
     user_id = int(get_jwt_identity())
     data = request.json
@@ -78,54 +81,155 @@ def create_multiple_schedules():
         start_time = ensure_ist(datetime.fromisoformat(start_time_str))
         end_time = ensure_ist(datetime.fromisoformat(end_time_str)) if end_time_str else None
 
-        created_schedules = []
-
         # Generate one group ID for this batch (IST timestamp in ms)
         schedule_group_id = int(now_ist().timestamp() * 1000)
 
-        # Insert Schedule rows for each device
+        # Load every device and video up front rather than one query per id
+        devices = {d.device_id: d for d in Device.query.filter(Device.device_id.in_(device_ids))}
+        videos = {v.video_id: v for v in Video.query.filter(Video.video_id.in_(video_ids))}
+
+        # Schedule rows for each device
+        schedule_rows = []
         for device_id in device_ids:
-            device = Device.query.get(device_id)
+            device = devices.get(int(device_id))
             if not device:
                 return jsonify({"msg": f"Device {device_id} not found"}), 404
             if device.user_id != user_id:
                 return jsonify({"msg": f"Device {device_id} not allowed"}), 403
 
-            schedule = Schedule(
-                device_id=device.device_id,
-                schedule_group_id=schedule_group_id,
-                start_time=start_time,
-                end_time=end_time,
-                repeat=repeat,
-                play_mode=play_mode,
-                is_active=True
-            )
-            db.session.add(schedule)
-            created_schedules.append(schedule)
-
-        # Insert ScheduleVideo rows (shared for the group)
+            schedule_rows.append({
+                "device_id": device.device_id,
+                "schedule_group_id": schedule_group_id,
+                "start_time": start_time,
+                "end_time": end_time,
+                "repeat": repeat,
+                "play_mode": play_mode,
+                "is_active": True,
+                "created_at": now_ist(),
+            })
+
+        # ScheduleVideo rows (shared for the group)
+        video_rows = []
         for idx, video_id in enumerate(video_ids):
-            video = Video.query.get(video_id)
+            video = videos.get(int(video_id))
             if not video:
                 return jsonify({"msg": f"Video {video_id} not found"}), 404
             if video.user_id != user_id:
                 return jsonify({"msg": f"Video {video_id} not allowed"}), 403
 
-            schedule_video = ScheduleVideo(
-                schedule_group_id=schedule_group_id,
-                video_id=video.video_id,
-                order_index=idx
-            )
-            db.session.add(schedule_video)
-
+            video_rows.append({
+                "schedule_group_id": schedule_group_id,
+                "video_id": video.video_id,
+                "order_index": idx
+            })
+
+        # One executemany INSERT per table; ids are read back by group
+        db.session.execute(insert(Schedule), schedule_rows)
+        db.session.execute(insert(ScheduleVideo), video_rows)
+        schedule_ids = [
+            schedule_id for (schedule_id,) in db.session.query(Schedule.schedule_id)
+            .filter_by(schedule_group_id=schedule_group_id)
+            .order_by(Schedule.schedule_id)
+        ]
         db.session.commit()
 
         return jsonify({
             "msg": "Schedules created successfully",
             "schedule_group_id": schedule_group_id,
-            "schedule_ids": [s.schedule_id for s in created_schedules]
+            "schedule_ids": schedule_ids
         }), 201
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": f"Failed to create schedules: {str(e)}"}), 500
+
+
+#---------------API FOR BULK SCHEDULE DETACH ----------------------
+
+@schedules_bp.route('/detach-videos', methods=['POST'])
+@jwt_required()
+def detach_videos_from_schedules():
+    """Remove videos from the user's schedule groups with one DELETE.
+
+    Body: {"video_ids": [...], "schedule_group_ids": [...]} - without
+    schedule_group_ids the videos are detached from every group. Remaining
+    entries keep their relative order.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    video_ids = data.get("video_ids")
+    group_ids = data.get("schedule_group_ids")
+    if not isinstance(video_ids, list) or not video_ids:
+        return jsonify({"msg": "video_ids must be a non-empty list"}), 400
+    if group_ids is not None and not isinstance(group_ids, list):
+        return jsonify({"msg": "schedule_group_ids must be a list"}), 400
+
+    owned_videos = select(Video.video_id).where(Video.video_id.in_(video_ids), Video.user_id == user_id)
+    stmt = delete(ScheduleVideo).where(ScheduleVideo.video_id.in_(owned_videos))
+    if group_ids is not None:
+        stmt = stmt.where(ScheduleVideo.schedule_group_id.in_(group_ids))
+    try:
+        result = db.session.execute(stmt.execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": f"Failed to detach videos: {str(e)}"}), 500
+
+    return jsonify({"msg": "Videos detached", "detached": result.rowcount}), 200
+
+
+#---------------API FOR FLEET READINESS ----------------------
+
+@schedules_bp.route('/<int:schedule_group_id>/readiness', methods=['GET'])
+@jwt_required()
+def schedule_group_readiness(schedule_group_id):
+    """Report which devices in a schedule group still lack which of its videos."""
+    user_id = int(get_jwt_identity())
+
+    ready_state = and_(
+        DeviceVideoState.device_id == Schedule.device_id,
+        DeviceVideoState.video_id == ScheduleVideo.video_id,
+        DeviceVideoState.status == "ready",
+    )
+    # Every (device, video) pair the group needs and whether it is ready, in one query
+    pairs = (
+        db.session.query(Schedule.device_id, Device.device_code, ScheduleVideo.video_id,
+                         DeviceVideoState.id.isnot(None))
+        .join(Device, Device.device_id == Schedule.device_id)
+        .join(ScheduleVideo, ScheduleVideo.schedule_group_id == Schedule.schedule_group_id)
+        .outerjoin(DeviceVideoState, ready_state)
+        .filter(
+            Schedule.schedule_group_id == schedule_group_id,
+            Schedule.is_active == True,
+            Device.user_id == user_id,
+        )
+        .distinct()
+        .all()
+    )
+    if not pairs:
+        return jsonify({"msg": "Schedule group not found"}), 404
+
+    per_device = {}
+    for device_id, device_code, video_id, ready in pairs:
+        entry = per_device.setdefault(device_id, {"device_code": device_code, "total": set(), "missing": set()})
+        entry["total"].add(video_id)
+        if not ready:
+            entry["missing"].add(video_id)
+
+    devices = [
+        {
+            "device_id": device_id,
+            "device_code": entry["device_code"],
+            "videos_total": len(entry["total"]),
+            "videos_ready": len(entry["total"] - entry["missing"]),
+            "missing_video_ids": sorted(entry["missing"]),
+        }
+        for device_id, entry in sorted(per_device.items())
+    ]
+    return jsonify({
+        "schedule_group_id": schedule_group_id,
+        "devices_total": len(devices),
+        "devices_ready": sum(1 for d in devices if not d["missing_video_ids"]),
+        "devices": devices,
+    }), 200
+
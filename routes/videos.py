@@ -2,16 +2,22 @@
 import os
 from flask import Blueprint, request, jsonify, Response, redirect
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.models import Video, Schedule, ScheduleVideo, Device
+from models.models import Video, Schedule, ScheduleVideo, Device, DeviceVideoState
 from datetime import datetime, timedelta, timezone
 from utils.timezone import IST, now_ist, ensure_ist
 from extensions import db
 import io
 from flask import send_file
-import boto3
 from dotenv import load_dotenv
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload, load_only
 from werkzeug.utils import secure_filename
+from utils.proof_of_play import parse_day_range, play_report
+from utils.pagination import page_args, field_args, set_next_cursor
+from utils.storage import get_storage, build_public_url, extract_object_key, unique_object_key
+from utils.deletions import delete_video_rows, enqueue_deletion, enqueue_deletions
+from utils.query_budget import query_budget
+from utils.db_routing import read_replica
 
 load_dotenv()
 videos_bp = Blueprint('videos', __name__)
@@ -23,55 +29,6 @@ ALLOWED_EXT = {'mp4', 'mov', 'mkv', 'avi'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in ALLOWED_EXT
 
-# Cloudflare R2 config
-R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
-R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
-R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
-R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
-R2_ENDPOINT_URL = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com" if R2_ACCOUNT_ID else None
-
-if R2_ENDPOINT_URL and R2_ACCESS_KEY_ID and R2_SECRET_ACCESS_KEY:
-    s3_client = boto3.client(
-        "s3",
-        endpoint_url=R2_ENDPOINT_URL,
-        aws_access_key_id=R2_ACCESS_KEY_ID,
-        aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-    )
-else:
-    s3_client = None
-
-PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
-
-def build_public_url(object_key: str) -> str:
-    """Return a public URL for a given object key using env configuration.
-    Falls back to account API endpoint if PUBLIC_BASE_URL isn't configured.
-    """
-    if PUBLIC_BASE_URL:
-        return f"{PUBLIC_BASE_URL}/{object_key}"
-    if R2_ENDPOINT_URL and R2_BUCKET_NAME:
-        return f"{R2_ENDPOINT_URL}/{R2_BUCKET_NAME}/{object_key}"
-    return object_key
-
-def extract_object_key(file_url: str) -> str:
-    """Best-effort to get the R2 object key from a stored URL regardless of domain style."""
-    try:
-        if PUBLIC_BASE_URL and file_url.startswith(PUBLIC_BASE_URL + "/"):
-            return file_url[len(PUBLIC_BASE_URL) + 1:]
-        if R2_ENDPOINT_URL:
-            api_prefix = f"{R2_ENDPOINT_URL}/"
-            if file_url.startswith(api_prefix):
-                suffix = file_url[len(api_prefix):]
-                if R2_BUCKET_NAME and suffix.startswith(f"{R2_BUCKET_NAME}/"):
-                    return suffix[len(R2_BUCKET_NAME) + 1:]
-                return suffix
-        parts = file_url.split("/")
-        if R2_BUCKET_NAME in parts:
-            idx = parts.index(R2_BUCKET_NAME)
-            return "/".join(parts[idx + 1:])
-        return "/".join(parts[3:]) if len(parts) > 3 else parts[-1]
-    except Exception:
-        return file_url
-
 # ---------------- Upload Video ----------------
 @videos_bp.route("/upload", methods=["POST"])
 @jwt_required()
@@ -92,17 +49,13 @@ def upload_video():
             title = filename
 
         duration = int(duration) if duration else None
-        object_key = f"videos/{user_id}/{filename}"
+        object_key = unique_object_key(f"videos/{user_id}", filename)
 
-        if s3_client is None:
+        storage = get_storage()
+        if storage is None:
             return jsonify({"msg": "Cloud storage not configured"}), 500
 
-        s3_client.upload_fileobj(
-            file,
-            R2_BUCKET_NAME,
-            object_key,
-            ExtraArgs={"ContentType": file.content_type}
-        )
+        storage.upload(file, object_key, content_type=file.content_type)
 
         video_link = build_public_url(object_key)
 
@@ -132,27 +85,47 @@ def upload_video():
         return jsonify({"msg": f"Upload failed: {str(e)}"}), 500
 
 # ---------------- Get User Videos ----------------
+# API field -> (Video column it needs, serializer)
+MY_VIDEO_FIELDS = {
+    "videoId": ("video_id", lambda v: v.video_id),
+    "title": ("title", lambda v: v.title),
+    "description": ("description", lambda v: v.description),
+    "duration": ("duration", lambda v: v.duration),
+    "uploadedAt": ("uploaded_at", lambda v: ensure_ist(v.uploaded_at).strftime("%Y-%m-%d %H:%M:%S") if v.uploaded_at else None),
+    "videoUrl": ("video_link", lambda v: v.video_link),
+}
+
 @videos_bp.route("/my-videos", methods=["GET"])
 @jwt_required()
 def get_user_videos():
+    """List the user's videos ordered by id.
+
+    Optional `limit`/`cursor` page through the list (next page cursor in the
+    X-Next-Cursor header) and `fields=` selects which keys, and columns, load.
+    """
     user_id = get_jwt_identity()
-    videos = Video.query.filter_by(user_id=user_id).all()
-
-    if not videos:
-        return jsonify([]), 200
-
-    result = [
-        {
-            "videoId": v.video_id,
-            "title": v.title,
-            "description": v.description,
-            "duration": v.duration,
-            "uploadedAt": ensure_ist(v.uploaded_at).strftime("%Y-%m-%d %H:%M:%S"),
-            "videoUrl": v.video_link
-        }
-        for v in videos
-    ]
-    return jsonify(result), 200
+    try:
+        limit, cursor = page_args(request.args)
+        fields = field_args(request.args, MY_VIDEO_FIELDS)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    columns = {getattr(Video, MY_VIDEO_FIELDS[f][0]) for f in fields} | {Video.video_id}
+    query = (
+        Video.query.options(load_only(*columns))
+        .filter_by(user_id=user_id)
+        .order_by(Video.video_id.asc())
+    )
+    if cursor is not None:
+        if not isinstance(cursor, int):
+            return jsonify({"msg": "Invalid cursor"}), 400
+        query = query.filter(Video.video_id > cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    videos = query.all()
+
+    result = [{f: MY_VIDEO_FIELDS[f][1](v) for f in fields} for v in videos]
+    return set_next_cursor(jsonify(result), videos, limit, lambda v: v.video_id), 200
 
 # ---------------- Stream Video ----------------
 @videos_bp.route("/<int:video_id>/stream", methods=["GET"])
@@ -174,19 +147,17 @@ def download_video(video_id):
 
     try:
         object_key = extract_object_key(video.video_link)
-        if s3_client is None:
+        storage = get_storage()
+        if storage is None:
             return jsonify({"msg": "Cloud storage not configured"}), 500
-        presigned_url = s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": R2_BUCKET_NAME, "Key": object_key},
-            ExpiresIn=300
-        )
+        presigned_url = storage.download_url(object_key, expires=300)
         return jsonify({"downloadUrl": presigned_url}), 200
     except Exception as e:
         return jsonify({"msg": f"Failed to generate download URL: {str(e)}"}), 500
 
 # ---------------- Default Video ----------------
 @videos_bp.route("/default-video", methods=["GET"])
+@read_replica
 def get_default_video():
     video = Video.query.filter_by(is_default=True).first()
     if not video:
@@ -210,34 +181,84 @@ def set_default_video(video_id):
     return jsonify({"message": f"{video.title} set as default"})
 
 # ---------------- Next Scheduled Videos (IST) ----------------
+# API field -> Video column it needs (None for fields computed from the schedule)
+NEXT_VIDEO_FIELDS = {
+    "videoId": "video_id",
+    "title": "title",
+    "description": "description",
+    "duration": "duration",
+    "startTime": None,
+    "endTime": None,
+    "deviceId": None,
+    "scheduleGroupId": None,
+    "videoUrl": "video_link",
+}
+
 @videos_bp.route("/my-next-videos", methods=["GET"])
 @jwt_required()
+@query_budget(3)
 def get_user_next_videos():
+    """List upcoming video slots across the user's active schedules.
+
+    Optional `limit`/`cursor` page through schedules ordered by
+    (start_time, schedule_id), so a page holds every slot of `limit`
+    schedules; `fields=` selects which keys, and video columns, load.
+    """
     user_id = get_jwt_identity()
     now = now_ist()
     print("Current IST time:", now)
 
-    upcoming_schedules = (
+    try:
+        limit, cursor = page_args(request.args)
+        fields = field_args(request.args, NEXT_VIDEO_FIELDS)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    query = (
         db.session.query(Schedule)
         .join(Device, Device.device_id == Schedule.device_id)
-        .filter(Device.user_id == user_id, Schedule.is_active == True)
-        .order_by(Schedule.start_time.asc())
-        .all()
+        .filter(
+            Device.user_id == user_id,
+            Schedule.is_active == True,
+            # Skip finished schedules; open-ended ones (no end_time) still count
+            or_(Schedule.end_time >= now, Schedule.end_time.is_(None)),
+        )
+        .order_by(Schedule.start_time.asc(), Schedule.schedule_id.asc())
     )
-
-    result = []
-    for schedule in upcoming_schedules:
-        current_time = ensure_ist(schedule.start_time)
-
+    if cursor is not None:
+        try:
+            after_start, after_id = datetime.fromisoformat(cursor[0]), int(cursor[1])
+        except (TypeError, ValueError, IndexError):
+            return jsonify({"msg": "Invalid cursor"}), 400
+        query = query.filter(or_(
+            Schedule.start_time > after_start,
+            and_(Schedule.start_time == after_start, Schedule.schedule_id > after_id),
+        ))
+    if limit is not None:
+        query = query.limit(limit)
+    upcoming_schedules = query.all()
+
+    # Load the videos of every group on this page in one query
+    video_columns = {getattr(Video, NEXT_VIDEO_FIELDS[f]) for f in fields if NEXT_VIDEO_FIELDS[f]}
+    video_columns |= {Video.video_id, Video.duration}
+    group_ids = {s.schedule_group_id for s in upcoming_schedules}
+    videos_by_group = {}
+    if group_ids:
         schedule_videos = (
             db.session.query(ScheduleVideo)
-            .filter(ScheduleVideo.schedule_group_id == schedule.schedule_group_id)
-            .order_by(ScheduleVideo.order_index.asc())
-            .options(joinedload(ScheduleVideo.video))
+            .filter(ScheduleVideo.schedule_group_id.in_(group_ids))
+            .order_by(ScheduleVideo.schedule_group_id, ScheduleVideo.order_index.asc())
+            .options(joinedload(ScheduleVideo.video).load_only(*video_columns))
             .all()
         )
-
         for sv in schedule_videos:
+            videos_by_group.setdefault(sv.schedule_group_id, []).append(sv)
+
+    result = []
+    for schedule in upcoming_schedules:
+        current_time = ensure_ist(schedule.start_time)
+
+        for sv in videos_by_group.get(schedule.schedule_group_id, []):
             video_duration = sv.video.duration or 0
             video_end_time = current_time + timedelta(seconds=video_duration)
 
@@ -245,23 +266,28 @@ def get_user_next_videos():
                 current_time = video_end_time
                 continue
 
-            result.append({
+            slot = {
                 "videoId": sv.video.video_id,
-                "title": sv.video.title,
-                "description": sv.video.description,
-                "duration": sv.video.duration,
                 "startTime": current_time.strftime("%Y-%m-%d %H:%M:%S"),
                 "endTime": video_end_time.strftime("%Y-%m-%d %H:%M:%S"),
                 "deviceId": schedule.device_id,
                 "scheduleGroupId": schedule.schedule_group_id,
-                "videoUrl": sv.video.video_link
+            }
+            result.append({
+                f: slot[f] if f in slot else getattr(sv.video, NEXT_VIDEO_FIELDS[f])
+                for f in fields
             })
 
             current_time = video_end_time
 
-    return jsonify(result), 200
+    return set_next_cursor(
+        jsonify(result), upcoming_schedules, limit,
+        lambda s: [s.start_time.isoformat(), s.schedule_id],
+    ), 200
 
 # ---------------- Delete Video ----------------
+BULK_DELETE_MAX = 1000
+
 @videos_bp.route("/delete/<int:video_id>", methods=["DELETE"])
 @jwt_required()
 def delete_video(video_id):
@@ -271,21 +297,11 @@ def delete_video(video_id):
         if not video:
             return jsonify({"msg": "Video not found"}), 404
 
+        # The object is removed by the storage deleter once this commits
         if video.video_link:
-            try:
-                if s3_client is None:
-                    raise RuntimeError("Cloud storage not configured")
-                video_key = extract_object_key(video.video_link)
-                s3_client.delete_object(Bucket=R2_BUCKET_NAME, Key=video_key)
-            except Exception as e:
-                print(f"[WARN] Failed to delete from R2: {e}")
-
-        devices_using_video = Device.query.filter_by(current_video_id=video_id).all()
-        for d in devices_using_video:
-            d.current_video_id = None
-
-        ScheduleVideo.query.filter_by(video_id=video_id).delete()
-        db.session.delete(video)
+            enqueue_deletion(extract_object_key(video.video_link))
+
+        delete_video_rows([video_id])
         db.session.commit()
 
         return jsonify({"msg": "Video deleted successfully"}), 200
@@ -294,4 +310,64 @@ def delete_video(video_id):
         db.session.rollback()
         return jsonify({"msg": f"Error deleting video: {str(e)}"}), 500
 
-    
+@videos_bp.route("/bulk-delete", methods=["POST"])
+@jwt_required()
+def bulk_delete_videos():
+    """Delete up to BULK_DELETE_MAX of the user's videos in one transaction.
+
+    Body: {"video_ids": [...]}. Ids that don't exist or belong to someone
+    else are returned in "not_found"; storage objects are queued in one batch.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    video_ids = data.get("video_ids")
+    if not isinstance(video_ids, list) or not video_ids:
+        return jsonify({"msg": "video_ids must be a non-empty list"}), 400
+    if len(video_ids) > BULK_DELETE_MAX:
+        return jsonify({"msg": f"At most {BULK_DELETE_MAX} videos per request"}), 400
+    try:
+        requested = {int(v) for v in video_ids}
+    except (TypeError, ValueError):
+        return jsonify({"msg": "video_ids must be integers"}), 400
+
+    try:
+        owned = (
+            db.session.query(Video.video_id, Video.video_link)
+            .filter(Video.video_id.in_(requested), Video.user_id == user_id)
+            .all()
+        )
+        deleted = [video_id for video_id, _ in owned]
+        if deleted:
+            enqueue_deletions([extract_object_key(link) for _, link in owned if link])
+            delete_video_rows(deleted)
+            db.session.commit()
+
+        return jsonify({
+            "msg": f"Deleted {len(deleted)} videos",
+            "deleted": sorted(deleted),
+            "not_found": sorted(requested - set(deleted)),
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": f"Error deleting videos: {str(e)}"}), 500
+
+# ---------------- Proof of Play ----------------
+@videos_bp.route("/<int:video_id>/proof-of-play", methods=["GET"])
+@jwt_required()
+def video_proof_of_play(video_id):
+    """Plays and screen time for one video per device and per day, read from the rollups."""
+    user_id = get_jwt_identity()
+    video = Video.query.filter_by(video_id=video_id, user_id=user_id).first()
+    if not video:
+        return jsonify({"msg": "Video not found"}), 404
+
+    try:
+        start, end = parse_day_range(request.args)
+    except ValueError as e:
+        return jsonify({"msg": f"Invalid date range: {e}"}), 400
+
+    report = play_report(start, end, "device_id", "devices", video_id=video.video_id)
+    report["video_id"] = video.video_id
+    return jsonify(report), 200
+
@@ -0,0 +1,325 @@
+"""Seed a fleet into a local database and replay the device polling protocol against the app.
+
+Each simulated Pi runs the same cycle as PI/device_app.py: fetch-schedules
+(revalidating with If-None-Match), update-playback for the video it is
+showing, and default-video. Polls are spread over --interval seconds with
++/- --jitter. The report gives throughput, p50/p95/p99 latency and SQL
+statements per request for each call.
+
+    python scripts/fleet_sim.py --devices 500 --duration 30
+    python scripts/fleet_sim.py --reset --devices 2000 --interval 5 --workers 32 --json
+    python scripts/fleet_sim.py --url http://localhost:5000 --db /srv/app.db --no-seed
+
+By default the app runs in-process, and statements are counted with
+SQLAlchemy events. With --url, requests go to a running server, which
+must use the same database as --db; statement counts then come from its
+/metrics endpoint. Seeding refuses to touch a database that already has
+users or devices unless --reset is given.
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+OPS = ("fetch-schedules", "update-playback", "default-video")
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+# ---------------- Seeding ----------------
+def has_data(db):
+    from sqlalchemy import inspect
+    from models.models import Device, User
+    tables = inspect(db.engine).get_table_names()
+    return any(model.__tablename__ in tables and db.session.query(model).first() is not None
+               for model in (User, Device))
+
+def seed(db, args):
+    """Insert users, videos, devices and schedule groups with bulk INSERTs."""
+    from sqlalchemy import insert
+    from models.models import Device, Schedule, ScheduleVideo, User, Video
+    from utils.timezone import now_ist
+
+    rng = random.Random(args.seed)
+    now = now_ist()
+    if args.reset:
+        db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(User), [
+        {"userId": u, "username": f"user{u}", "email": f"user{u}@fleet.sim",
+         "mobile_number": f"9{u:09d}", "created_at": now}
+        for u in range(1, args.users + 1)
+    ])
+    videos_by_user = {}
+    video_rows = []
+    for u in range(1, args.users + 1):
+        for n in range(args.videos_per_user):
+            video_id = len(video_rows) + 1
+            videos_by_user.setdefault(u, []).append(video_id)
+            video_rows.append({
+                "video_id": video_id, "title": f"clip {u}-{n}", "user_id": u,
+                "video_link": f"https://cdn.fleet.sim/videos/{u}/clip{n}.mp4",
+                "duration": rng.randint(10, 120), "is_default": video_id == 1, "uploaded_at": now,
+            })
+    db.session.execute(insert(Video), video_rows)
+
+    devices = []
+    for d in range(1, args.devices + 1):
+        devices.append({"device_id": d, "device_code": f"sim-{d:05d}", "device_token": f"simtoken{d:08d}",
+                        "user_id": (d - 1) % args.users + 1, "status": "inactive",
+                        "playback_state": "stopped", "created_at": now, "updated_at": now})
+    db.session.execute(insert(Device), devices)
+
+    schedule_rows, group_video_rows = [], []
+    for device in devices:
+        user_videos = videos_by_user[device["user_id"]]
+        for k in range(args.groups_per_device):
+            group_id = device["device_id"] * 1000 + k
+            start = now + timedelta(hours=k * 2) - timedelta(minutes=30)
+            schedule_rows.append({"device_id": device["device_id"], "schedule_group_id": group_id,
+                                  "start_time": start, "end_time": start + timedelta(hours=2),
+                                  "repeat": False, "is_active": True, "play_mode": "loop", "created_at": now})
+            for idx, video_id in enumerate(rng.sample(user_videos, min(args.videos_per_group, len(user_videos)))):
+                group_video_rows.append({"schedule_group_id": group_id, "video_id": video_id, "order_index": idx})
+    db.session.execute(insert(Schedule), schedule_rows)
+    db.session.execute(insert(ScheduleVideo), group_video_rows)
+    db.session.commit()
+    return [(d["device_token"], videos_by_user[d["user_id"]]) for d in devices]
+
+def load_fleet(db):
+    from models.models import Device, Video
+    videos = {}
+    for video_id, user_id in db.session.query(Video.video_id, Video.user_id):
+        videos.setdefault(user_id, []).append(video_id)
+    return [(token, videos.get(user_id, [None]))
+            for token, user_id in db.session.query(Device.device_token, Device.user_id).order_by(Device.device_id)]
+
+# ---------------- Transports ----------------
+class InProcessClient:
+    """Calls the app through Flask's test client, one per worker thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def request(self, method, path, json_body=None, headers=None):
+        resp = self._client().open(path, method=method, json=json_body, headers=headers or {})
+        return resp.status_code, resp.headers.get("ETag")
+
+class HttpClient:
+    """Calls a running server over HTTP with one keep-alive session per worker thread."""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        if not hasattr(self._local, "session"):
+            self._local.session = self.requests.Session()
+        resp = self._local.session.request(method, self.base_url + path, json=json_body,
+                                           headers=headers or {}, timeout=30)
+        return resp.status_code, resp.headers.get("ETag")
+
+    def sql_statements(self):
+        """Total sql_statements_total across endpoints from /metrics, or None."""
+        try:
+            text = self.requests.get(self.base_url + "/metrics", timeout=10).text
+        except self.requests.RequestException:
+            return None
+        return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+                   if line.startswith("sql_statements_total{"))
+
+# ---------------- Simulation ----------------
+class Fleet:
+    def __init__(self, client, fleet, args):
+        self.client = client
+        self.fleet = fleet
+        self.args = args
+        self.rng = random.Random(args.seed)
+        # One generator per device, so a run repeats exactly whatever order threads poll in
+        self.device_rngs = [random.Random(self.rng.getrandbits(64)) for _ in fleet]
+        self.lock = threading.Lock()
+        self.etags = {}
+        self.latencies = {op: [] for op in OPS}
+        self.statuses = {op: {} for op in OPS}
+        self.statements = {op: 0 for op in OPS}
+        self.current_op = threading.local()
+        # (due time, device index): first polls spread across one interval
+        self.queue = [(self.rng.uniform(0, args.interval), i) for i in range(len(fleet))]
+        heapq.heapify(self.queue)
+
+    def count_statement(self, *_):
+        op = getattr(self.current_op, "name", None)
+        if op:
+            with self.lock:
+                self.statements[op] += 1
+
+    def call(self, op, method, path, body=None, headers=None):
+        self.current_op.name = op
+        start = time.perf_counter()
+        try:
+            status, etag = self.client.request(method, path, body, headers)
+        except Exception as e:
+            status, etag = type(e).__name__, None
+        elapsed = time.perf_counter() - start
+        self.current_op.name = None
+        with self.lock:
+            self.latencies[op].append(elapsed)
+            self.statuses[op][status] = self.statuses[op].get(status, 0) + 1
+        return status, etag
+
+    def poll(self, index):
+        token, videos = self.fleet[index]
+        headers = {"If-None-Match": self.etags[index]} if index in self.etags else None
+        status, etag = self.call("fetch-schedules", "POST", "/api/devices/fetch-schedules",
+                                 {"device_token": token}, headers)
+        if etag:
+            self.etags[index] = etag
+        self.call("update-playback", "POST", "/api/devices/update-playback",
+                  {"device_token": token, "video_id": self.device_rngs[index].choice(videos), "playback_state": "playing"})
+        self.call("default-video", "GET", "/api/videos/default-video")
+
+    def worker(self, deadline):
+        while True:
+            with self.lock:
+                if not self.queue:
+                    return
+                due, index = heapq.heappop(self.queue)
+            now = time.monotonic() - self.started
+            if due > now:
+                if self.started + due >= deadline:
+                    return
+                time.sleep(due - now)
+            if time.monotonic() >= deadline:
+                return
+            self.poll(index)
+            jitter = 1 + self.device_rngs[index].uniform(-self.args.jitter, self.args.jitter)
+            with self.lock:
+                heapq.heappush(self.queue, (due + self.args.interval * jitter, index))
+
+    def run(self):
+        self.started = time.monotonic()
+        deadline = self.started + self.args.duration
+        threads = [threading.Thread(target=self.worker, args=(deadline,), daemon=True)
+                   for _ in range(self.args.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.monotonic() - self.started
+
+def report(fleet, elapsed, args, remote_statements=None):
+    ops = {}
+    for op in OPS:
+        lat = fleet.latencies[op]
+        count = len(lat)
+        ops[op] = {
+            "requests": count,
+            "per_second": round(count / elapsed, 1),
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p95_ms": round(percentile(lat, 95) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(lat) * 1000, 2) if lat else 0.0,
+            "statuses": {str(k): v for k, v in sorted(fleet.statuses[op].items(), key=str)},
+            "sql_per_request": round(fleet.statements[op] / count, 2) if count and remote_statements is None else None,
+        }
+    total = sum(o["requests"] for o in ops.values())
+    result = {
+        "devices": len(fleet.fleet), "workers": args.workers, "interval_s": args.interval,
+        "elapsed_s": round(elapsed, 2), "requests": total, "per_second": round(total / elapsed, 1),
+        "sql_statements": remote_statements if remote_statements is not None else sum(fleet.statements.values()),
+        "ops": ops,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['devices']} devices, {args.workers} workers, {elapsed:.1f}s: "
+          f"{total} requests ({result['per_second']}/s), {result['sql_statements']:.0f} SQL statements")
+    print(f"{'call':<16}{'req':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'sql/req':>9}  statuses")
+    for op, o in ops.items():
+        sql = "-" if o["sql_per_request"] is None else f"{o['sql_per_request']:.2f}"
+        print(f"{op:<16}{o['requests']:>8}{o['per_second']:>9}{o['p50_ms']:>9}{o['p95_ms']:>9}"
+              f"{o['p99_ms']:>9}{sql:>9}  {o['statuses']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "fleet_sim.db"),
+                        help="SQLite file to seed (default: in the temp directory)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in --db")
+    parser.add_argument("--reset", action="store_true", help="drop every table in --db before seeding")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--videos-per-user", type=int, default=30)
+    parser.add_argument("--groups-per-device", type=int, default=3)
+    parser.add_argument("--videos-per-group", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=20, help="seconds to simulate")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="seconds between a device's polls (the Pi uses 180; compress to load the app)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction applied to each interval")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    from app import create_app
+    from extensions import db
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(args.db)}",
+        "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+        "SECRET_KEY": "fleet-sim",
+        "JWT_SECRET_KEY": "fleet-sim-" + "x" * 32,
+        "BACKGROUND_TASKS": False,
+        "RATE_LIMIT_ENABLED": False,  # the simulated fleet polls far faster than real devices
+        "MAIL_TRANSPORT": "local",
+        "SMS_TRANSPORT": "local",
+    })
+    with app.app_context():
+        db.session.execute(db.text("PRAGMA journal_mode=WAL"))
+        if not args.no_seed and not args.reset and has_data(db):
+            sys.exit(f"{args.db} already has data; pass --reset to drop it or --no-seed to reuse it")
+        fleet_data = load_fleet(db) if args.no_seed else seed(db, args)
+        db.session.remove()
+        if not fleet_data:
+            sys.exit("No devices in the database; run without --no-seed first")
+
+        if args.url:
+            client = HttpClient(args.url)
+            fleet = Fleet(client, fleet_data, args)
+            before = client.sql_statements()
+            elapsed = fleet.run()
+            after = client.sql_statements()
+            remote = after - before if before is not None and after is not None else None
+            report(fleet, elapsed, args, remote_statements=remote)
+        else:
+            from sqlalchemy import event
+            fleet = Fleet(InProcessClient(app), fleet_data, args)
+            event.listen(db.engine, "before_cursor_execute", fleet.count_statement)
+            elapsed = fleet.run()
+            report(fleet, elapsed, args)
+
+if __name__ == "__main__":
+    main()
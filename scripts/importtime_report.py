@@ -0,0 +1,92 @@
+"""Report what importing the app costs at worker start-up.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter,
+parses the timings it prints to stderr and lists the slowest top-level
+packages by cumulative time.
+
+    python scripts/importtime_report.py                 # import app, top 20
+    python scripts/importtime_report.py --runs 5 --json
+    python scripts/importtime_report.py --max-ms 1500   # exit 1 if slower (for CI)
+    python scripts/importtime_report.py --forbid boto3 --forbid google.auth
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def run_importtime(module):
+    """Import `module` in a fresh interpreter; returns [(self_us, cumulative_us, depth, name)]."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+def summarize(rows, module):
+    total = next((cum for _, cum, depth, name in rows if name == module and depth == 0), None)
+    packages = {}
+    for _, cumulative_us, _, name in rows:
+        top = name.split(".")[0]
+        # the outermost import of a package already includes its submodules
+        packages[top] = max(packages.get(top, 0), cumulative_us)
+    return total, packages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="module to import (default: app)")
+    parser.add_argument("--runs", type=int, default=3, help="imports to run; the median is reported")
+    parser.add_argument("--top", type=int, default=20, help="packages to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-ms", type=float, help="exit 1 if the median import takes longer")
+    parser.add_argument("--forbid", action="append", default=[],
+                        help="exit 1 if this module is imported at start-up (repeatable)")
+    args = parser.parse_args()
+
+    totals, per_package, imported = [], {}, set()
+    for _ in range(args.runs):
+        rows = run_importtime(args.module)
+        total, packages = summarize(rows, args.module)
+        totals.append(total or 0)
+        for name, us in packages.items():
+            per_package.setdefault(name, []).append(us)
+        imported.update(name for *_, name in rows)
+
+    median_ms = statistics.median(totals) / 1000
+    ranked = sorted(((statistics.median(v) / 1000, k) for k, v in per_package.items()
+                     if k != args.module), reverse=True)[:args.top]
+    forbidden = sorted(m for m in args.forbid if m in imported)
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "runs": args.runs,
+            "total_ms": round(median_ms, 1),
+            "packages": [{"name": name, "cumulative_ms": round(ms, 1)} for ms, name in ranked],
+            "forbidden_imported": forbidden,
+        }, indent=2))
+    else:
+        print(f"import {args.module}: {median_ms:.1f} ms (median of {args.runs})")
+        print(f"{'cumulative ms':>14}  package")
+        for ms, name in ranked:
+            print(f"{ms:14.1f}  {name}")
+        for name in forbidden:
+            print(f"FORBIDDEN: {name} is imported at start-up")
+
+    if forbidden or (args.max_ms is not None and median_ms > args.max_ms):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from extensions import db
+from models.models import Device, Schedule, ScheduleVideo, User, Video
+from utils.query_budget import QueryBudgetExceeded, assert_max_queries
+from utils.timezone import now_ist
+
+N = 10  # rows per table; an N+1 shows up as N repeats of one statement
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "SECRET_KEY": "test",
+        "JWT_SECRET_KEY": "test-" + "x" * 32,
+        "RATE_LIMIT_ENABLED": False,
+        "METRICS_DIR": str(tmp_path / "metrics"),
+        "QUERY_REPEAT_THRESHOLD": 5,
+    })
+    with app.app_context():
+        db.create_all()
+        seed()
+        yield app
+        db.session.remove()
+
+def seed():
+    user = User(username="owner", email="owner@example.com", mobile_number="9000000000")
+    db.session.add(user)
+    db.session.flush()
+    videos = [Video(title=f"clip {i}", video_link=f"https://cdn.example.com/videos/{user.userId}/{i}.mp4",
+                    user_id=user.userId, duration=30, is_default=(i == 0)) for i in range(N)]
+    devices = [Device(device_code=f"screen-{i}", device_token=f"token-{i}", user_id=user.userId) for i in range(N)]
+    db.session.add_all(videos + devices)
+    db.session.flush()
+    start = now_ist() + timedelta(minutes=1)
+    for group_id, device in enumerate(devices, start=1):
+        db.session.add(Schedule(device_id=device.device_id, schedule_group_id=group_id,
+                                start_time=start, end_time=start + timedelta(hours=2)))
+        db.session.add_all(ScheduleVideo(schedule_group_id=group_id, video_id=v.video_id, order_index=i)
+                           for i, v in enumerate(videos))
+    db.session.commit()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def auth(app):
+    user = User.query.first()
+    return {"Authorization": f"Bearer {create_access_token(identity=str(user.userId))}"}
+
+def test_list_devices_is_constant(client, auth):
+    with assert_max_queries(4):
+        resp = client.get("/api/devices/list", headers=auth)
+    assert resp.status_code == 200
+    assert len(resp.get_json()["devices"]) == N
+
+def test_fetch_schedules_is_constant(client):
+    with assert_max_queries(6):
+        resp = client.post("/api/devices/fetch-schedules", json={"device_token": "token-0"})
+    assert resp.status_code == 200
+    assert len(resp.get_json()["schedules"][0]["videos"]) == N
+
+def test_my_next_videos_is_constant(client, auth):
+    with assert_max_queries(3):
+        resp = client.get("/api/videos/my-next-videos", headers=auth)
+    assert resp.status_code == 200
+    assert len(resp.get_json()) == N * N
+
+def test_detects_n_plus_one(app):
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        with assert_max_queries(N + 1):
+            for device in Device.query.all():
+                Video.query.filter_by(user_id=device.user_id).first()
+
+def test_raise_mode_fails_request(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "JWT_SECRET_KEY": "test-" + "x" * 32,
+        "METRICS_DIR": str(tmp_path / "metrics"),
+        "QUERY_BUDGET_MODE": "raise",
+        "QUERY_BUDGET_DEFAULT": 2,
+    })
+
+    @app.route("/n-plus-one")
+    def n_plus_one():
+        return {"titles": [db.session.get(Video, d.device_id).title for d in Device.query.all()]}
+
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+        # fetch-schedules declares its own budget of 6 and stays within it
+        assert client.post("/api/devices/fetch-schedules", json={"device_token": "token-0"}).status_code == 200
+        with pytest.raises(QueryBudgetExceeded):
+            client.get("/n-plus-one")
@@ -0,0 +1,108 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every serving process counts as elected
+    fcntl = None
+
+ELECTION_RETRY_SECONDS = 30
+
+class PeriodicTask:
+    """Run `func` every `interval` seconds on a daemon thread, inside an app context."""
+
+    def __init__(self, app, name, interval, func):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.func()
+                except Exception:
+                    self.app.logger.exception("Background task %s failed", self.name)
+
+def register_periodic(app, name, interval, func, shared=False):
+    """Register `func` to run every `interval` seconds once start_background_tasks() is called.
+
+    Per-process tasks (caches, in-memory state) run in every serving process.
+    Shared tasks drain tables every process sees (jobs, deletions, OTP expiry)
+    and run in one elected process per host.
+    """
+    tasks = app.extensions.setdefault("periodic_tasks", {})
+    if name not in tasks:
+        tasks[name] = PeriodicTask(app, name, interval, func), shared
+    return tasks[name][0]
+
+class _Election:
+    """Holds BACKGROUND_LOCK_PATH with an exclusive flock for the life of the process.
+
+    Processes that lose retry every ELECTION_RETRY_SECONDS, so the shared
+    tasks move to another worker when the holder exits.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self):
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+def start_background_tasks(app):
+    """Start the registered tasks in a serving process (wsgi.py, app.py).
+
+    CLI commands never call this, so `flask db upgrade` and friends start no
+    threads and `flask run-jobs` drains in the foreground alone. Controlled
+    by the BACKGROUND_TASKS config flag; off by default when testing.
+    """
+    if not app.config.get("BACKGROUND_TASKS", not app.testing):
+        return
+    if app.extensions.get("background_started"):
+        return
+    app.extensions["background_started"] = True
+    tasks = app.extensions.get("periodic_tasks", {})
+    shared = [task for task, is_shared in tasks.values() if is_shared]
+    for task, is_shared in tasks.values():
+        if not is_shared:
+            task.start()
+    if not shared:
+        return
+
+    # Kept on the app so the lock file stays open (and locked) for the life of the process
+    election = app.extensions["background_election"] = _Election(
+        app.config.get("BACKGROUND_LOCK_PATH") or os.path.join(app.instance_path, "background.lock"))
+
+    def start_shared_if_elected():
+        if shared and election.try_acquire():
+            app.logger.info("Elected to run shared background tasks in pid %s", os.getpid())
+            while shared:
+                shared.pop().start()
+
+    start_shared_if_elected()
+    if shared:
+        PeriodicTask(app, "background-election", ELECTION_RETRY_SECONDS, start_shared_if_elected).start()
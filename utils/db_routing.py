@@ -0,0 +1,72 @@
+import random
+from functools import wraps
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_PREFIX = "replica_"
+
+class RoutingSession(Session):
+    """Send reads in views marked @read_replica to a replica and everything else to the primary.
+
+    Replicas are the "replica_<n>" binds created from DATABASE_REPLICA_URLS.
+    A request uses one replica, picked at random, for all its reads. Routing
+    is opt-in because a lagging replica can miss rows the caller just
+    created: only mark views that tolerate that, or that retry on the
+    primary with use_primary(). After the request flushes or runs a write
+    statement, every later query goes to the primary so it reads its own
+    writes. Background tasks and CLI commands always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self._replica_for(clause)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_for(self, clause):
+        if self._flushing or not has_request_context():
+            return None
+        if getattr(clause, "is_dml", False):
+            g.db_primary = True
+            return None
+        if g.get("db_primary"):
+            return None
+        if not g.get("db_read_only"):
+            return None
+        if "db_replica" not in g:
+            replicas = [key for key in self._db.engines if key and key.startswith(REPLICA_PREFIX)]
+            g.db_replica = random.choice(replicas) if replicas else None
+        return self._db.engines[g.db_replica] if g.db_replica else None
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary(session, flush_context):
+    if has_request_context():
+        g.db_primary = True
+
+def use_primary():
+    """Route the rest of this request's queries to the primary, e.g. to read fresh rows."""
+    if has_request_context():
+        g.db_primary = True
+
+def read_replica(view):
+    """Let a view that only reads, and tolerates replica lag, use a replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+def configure_replicas(app):
+    """Add a "replica_<n>" bind for each URL in DATABASE_REPLICA_URLS (comma-separated).
+
+    Must run before db.init_app so the engines are created with the others.
+    """
+    urls = app.config.get("DATABASE_REPLICA_URLS") or []
+    if isinstance(urls, str):
+        urls = [u.strip() for u in urls.split(",") if u.strip()]
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for n, url in enumerate(urls):
+        binds[f"{REPLICA_PREFIX}{n}"] = url
+    app.config["SQLALCHEMY_BINDS"] = binds
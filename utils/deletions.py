@@ -0,0 +1,144 @@
+import uuid
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import and_, delete, insert, or_, update
+from extensions import db
+from models.models import Device, DeviceVideoState, ScheduleVideo, StorageDeletion, User, Video
+from utils.background import register_periodic
+from utils.jobs import retry_at
+from utils.storage import get_storage
+from utils.timezone import now_ist
+
+DELETE_BATCH_SIZE = 1000  # S3/R2 DeleteObjects limit
+DELETE_MAX_ATTEMPTS = 8
+DELETE_LOCK_TIMEOUT = timedelta(minutes=5)
+REFERENCE_CHUNK = 100  # keys per suffix-match query
+
+def enqueue_deletions(keys):
+    """Queue storage keys for deletion in the caller's transaction; durable once it commits."""
+    rows = [{"object_key": k, "status": "pending", "attempts": 0, "run_after": now_ist(),
+             "created_at": now_ist()} for k in keys if k]
+    if rows:
+        db.session.execute(insert(StorageDeletion), rows)
+    return len(rows)
+
+def enqueue_deletion(key):
+    return enqueue_deletions([key])
+
+def delete_video_rows(video_ids):
+    """Delete videos and everything that points at them with set-based statements.
+
+    Runs in the caller's transaction; storage objects are left to the caller.
+    """
+    db.session.execute(
+        update(Device).where(Device.current_video_id.in_(video_ids)).values(current_video_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    for model in (ScheduleVideo, DeviceVideoState):
+        db.session.execute(
+            delete(model).where(model.video_id.in_(video_ids)).execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        delete(Video).where(Video.video_id.in_(video_ids)).execution_options(synchronize_session=False)
+    )
+
+class DeletionWorker:
+    """Claims due deletions in batches and removes them with one delete_objects call.
+
+    A batch is claimed with a single conditional UPDATE stamped with a
+    random token, so concurrent workers never pick up the same rows. Keys a
+    video or profile photo still links to are dropped from the queue
+    without being deleted.
+    """
+
+    def __init__(self, batch_size=DELETE_BATCH_SIZE):
+        self.batch_size = min(batch_size, DELETE_BATCH_SIZE)
+
+    def _claim(self):
+        now = now_ist()
+        due = or_(
+            and_(StorageDeletion.status == "pending", StorageDeletion.run_after <= now),
+            and_(StorageDeletion.status == "running", StorageDeletion.locked_at < now - DELETE_LOCK_TIMEOUT),
+        )
+        candidates = [
+            deletion_id for (deletion_id,) in db.session.query(StorageDeletion.deletion_id)
+            .filter(due).order_by(StorageDeletion.deletion_id).limit(self.batch_size)
+        ]
+        if not candidates:
+            return []
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(StorageDeletion)
+            .where(StorageDeletion.deletion_id.in_(candidates), due)
+            .values(status="running", locked_at=now, claim_token=token)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return db.session.query(StorageDeletion).filter_by(claim_token=token, status="running").all()
+
+    def _still_referenced(self, keys):
+        """Keys a video or profile photo still links to; those must not be deleted.
+
+        Links are matched on their "/<key>" suffix, so this holds whatever
+        public base URL they were stored with.
+        """
+        keys = sorted(keys)
+        referenced = set()
+        for start in range(0, len(keys), REFERENCE_CHUNK):
+            chunk = keys[start:start + REFERENCE_CHUNK]
+            for column in (Video.video_link, User.profile_photo_url):
+                match = or_(*(column.endswith("/" + k, autoescape=True) for k in chunk), column.in_(chunk))
+                for (link,) in db.session.query(column).filter(match):
+                    referenced.update(k for k in chunk if link == k or link.endswith("/" + k))
+        return referenced
+
+    def run_once(self):
+        """Delete one batch of due keys; returns how many rows were processed."""
+        storage = get_storage()
+        if storage is None:
+            return 0
+        claimed = self._claim()
+        if not claimed:
+            return 0
+        keys = {d.object_key for d in claimed}
+        keys = sorted(keys - self._still_referenced(keys))
+        try:
+            errors = storage.delete_many(keys) if keys else {}
+        except Exception as e:
+            errors = {k: str(e) for k in keys}
+
+        done = [d.deletion_id for d in claimed if d.object_key not in errors]
+        if done:
+            db.session.execute(
+                delete(StorageDeletion).where(StorageDeletion.deletion_id.in_(done))
+                .execution_options(synchronize_session=False)
+            )
+        for d in claimed:
+            if d.object_key not in errors:
+                continue
+            d.attempts += 1
+            d.last_error = errors[d.object_key][:2000]
+            d.locked_at = None
+            d.claim_token = None
+            if d.attempts >= DELETE_MAX_ATTEMPTS:
+                d.status = "failed"
+                current_app.logger.error("Storage deletion of %s failed permanently: %s", d.object_key, d.last_error)
+            else:
+                d.status = "pending"
+                d.run_after = retry_at(d.attempts)
+        db.session.commit()
+        return len(claimed)
+
+    def drain(self):
+        """Delete batches until nothing is due."""
+        total = 0
+        while True:
+            processed = self.run_once()
+            total += processed
+            if not processed:
+                return total
+
+def init_app(app):
+    worker = DeletionWorker(app.config.get("STORAGE_DELETE_BATCH_SIZE", DELETE_BATCH_SIZE))
+    register_periodic(app, "storage-deleter", app.config.get("STORAGE_DELETE_POLL_SECONDS", 10), worker.drain,
+                      shared=True)
@@ -0,0 +1,83 @@
+import io
+import json
+import os
+import threading
+import zipfile
+from utils.metrics import record_cache
+
+DEVICE_APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "PI", "device_app.py"))
+START_SH = "#!/bin/bash\npython3 device_app.py\n"
+START_BAT = "@echo off\npython device_app.py\npause\n"
+
+class PackageTemplate:
+    """The static part of a device package, deflated once and reused.
+
+    The template ZIP (device_app.py plus start scripts) is rebuilt only when
+    device_app.py's mtime changes. Each package copies the compressed bytes
+    and appends its own config.json, so nothing is recompressed per device.
+    """
+
+    def __init__(self, app_path=DEVICE_APP_PATH):
+        self.app_path = app_path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._zip_bytes = None
+
+    def _build(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(self.app_path, "device_app.py")
+            zf.writestr("start.sh", START_SH)
+            zf.writestr("start.bat", START_BAT)
+        return buf.getvalue()
+
+    def template(self):
+        mtime = os.stat(self.app_path).st_mtime_ns  # FileNotFoundError if the app is missing
+        record_cache("device_package", mtime == self._mtime)
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._zip_bytes = self._build()
+                    self._mtime = mtime
+        return self._zip_bytes
+
+    def package(self, config):
+        """Return one device's ZIP: the cached template plus its config.json."""
+        buf = io.BytesIO(self.template())
+        buf.seek(0, io.SEEK_END)
+        with zipfile.ZipFile(buf, "a", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("config.json", json.dumps(config, indent=2))
+        return buf.getvalue()
+
+package_template = PackageTemplate()
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable sink that collects whatever zipfile writes, for streaming."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_archive(members):
+    """Yield a ZIP of (filename, bytes) members chunk by chunk.
+
+    Members are stored, not deflated - the per-device packages are already
+    compressed - and only one member is held in memory at a time.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+            yield sink.take()
+    yield sink.take()
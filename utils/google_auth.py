@@ -0,0 +1,115 @@
+import re
+import threading
+import time
+from flask import current_app
+from utils.background import register_periodic
+from utils.metrics import record_cache
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+DEFAULT_MAX_AGE = 3600       # used when the response has no Cache-Control max-age
+REFRESH_MARGIN = 300         # refresh this many seconds before the certs expire
+CLOCK_SKEW_SECONDS = 10
+UNKNOWN_KID_REFETCH_SECONDS = 60  # at most one early refetch per minute for unseen key ids
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+def max_age(cache_control):
+    match = _MAX_AGE_RE.search(cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+class GoogleCertCache:
+    """Google's ID-token signing certs, shared by every request in the worker.
+
+    Certs are kept for the response's Cache-Control max-age. Once they are
+    stale the cached copy is still served while one background thread
+    refetches, so only the first login after start-up waits on Google.
+    A token signed with a key id the cache hasn't seen (Google rotated keys
+    early) triggers one synchronous refetch, at most once per
+    UNKNOWN_KID_REFETCH_SECONDS.
+    """
+
+    def __init__(self, url=GOOGLE_CERTS_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self._certs = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._last_kid_refetch = 0.0
+        self.refreshes = 0
+
+    def refresh(self):
+        import requests
+        resp = requests.get(self.url, timeout=self.timeout)
+        resp.raise_for_status()
+        certs = resp.json()
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.time() + max_age(resp.headers.get("Cache-Control"))
+            self.refreshes += 1
+        return certs
+
+    def refresh_if_due(self, margin=REFRESH_MARGIN):
+        if time.time() >= self._expires_at - margin:
+            self.refresh()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Google cert refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="google-certs-refresh", daemon=True).start()
+
+    def get(self):
+        certs = self._certs
+        record_cache("google_certs", certs is not None)
+        if certs is None:
+            return self.refresh()
+        if time.time() >= self._expires_at:
+            self._refresh_in_background()
+        return certs
+
+    def get_for_kid(self, kid):
+        """Certs that should contain `kid`, refetching early if it is unknown."""
+        certs = self.get()
+        if kid is None or kid in certs:
+            return certs
+        with self._lock:
+            if time.time() - self._last_kid_refetch < UNKNOWN_KID_REFETCH_SECONDS:
+                return certs
+            self._last_kid_refetch = time.time()
+        return self.refresh()
+
+def init_app(app):
+    """Create the worker's cert cache and keep it refreshed ahead of expiry."""
+    cache = GoogleCertCache(app.config.get("GOOGLE_CERTS_URL") or GOOGLE_CERTS_URL)
+    app.extensions["google_certs"] = cache
+    register_periodic(app, "google-certs", 60, cache.refresh_if_due)
+
+def verify_google_id_token(token):
+    """Verify a Google ID token against the cached certs; raises ValueError if invalid.
+
+    Checks the signature, expiry and issuer, and the audience when
+    GOOGLE_CLIENT_ID is configured.
+    """
+    import google.auth.jwt
+    cache = current_app.extensions["google_certs"]
+    id_info = google.auth.jwt.decode(
+        token,
+        certs=cache.get_for_kid(google.auth.jwt.decode_header(token).get("kid")),
+        audience=current_app.config.get("GOOGLE_CLIENT_ID") or None,
+        clock_skew_in_seconds=CLOCK_SKEW_SECONDS,
+    )
+    if id_info.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {id_info.get('iss')}")
+    return id_info
@@ -0,0 +1,254 @@
+import json
+import random
+import smtplib
+import threading
+import time
+from datetime import timedelta
+from email.mime.text import MIMEText
+from flask import current_app
+from sqlalchemy import and_, delete, or_, update
+from extensions import db
+from models.models import OutboundJob
+from utils.background import register_periodic
+from utils.timezone import now_ist
+
+# Running jobs whose worker died are picked up again after this long
+JOB_LOCK_TIMEOUT = timedelta(minutes=5)
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 15 * 60
+# Payload fields kept on a failed job for debugging; the rest (OTPs, bodies) is dropped
+REDACTED_KEEP = ("to", "subject")
+
+def retry_at(attempts):
+    """When to retry after `attempts` failures: jittered exponential backoff."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return now_ist() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def enqueue(kind, payload, max_attempts=5):
+    """Add a delivery job to the session; it is durable once the caller commits."""
+    job = OutboundJob(kind=kind, payload=json.dumps(payload), max_attempts=max_attempts,
+                      run_after=now_ist())
+    db.session.add(job)
+    return job
+
+def queue_email(recipient, subject, body):
+    return enqueue("email", {"to": recipient, "subject": subject, "body": body})
+
+def queue_sms_otp(mobile_number, otp):
+    return enqueue("sms", {"to": mobile_number, "otp": otp})
+
+# ---------------------------- Transports ----------------------------
+class SmtpTransport:
+    """Sends email over one SMTP connection kept open between jobs."""
+
+    IDLE_CHECK_SECONDS = 60
+
+    def __init__(self, config):
+        self.host = config.get("SMTP_SERVER", "smtp.gmail.com")
+        self.port = config.get("SMTP_PORT", 587)
+        self.sender = config.get("SMTP_EMAIL")
+        self.password = config.get("SMTP_PASSWORD")
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        server.starttls()
+        server.login(self.sender, self.password)
+        return server
+
+    def _connection(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.IDLE_CHECK_SECONDS:
+            try:
+                self._server.noop()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send_email(self, to, subject, body):
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = to
+        try:
+            self._connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server dropped the idle connection; reconnect once
+            self.close()
+            self._connection().send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+class TwoFactorTransport:
+    """Sends OTP SMS through the 2Factor API."""
+
+    def __init__(self, config):
+        self.api_key = config.get("TWO_FACTOR_API_KEY")
+        self.timeout = config.get("SMS_TIMEOUT_SECONDS", 10)
+
+    def send_sms_otp(self, to, otp):
+        import requests
+        if not self.api_key:
+            raise ValueError("TWO_FACTOR_API_KEY not configured")
+        response = requests.get(f"https://2factor.in/API/V1/{self.api_key}/SMS/{to}/{otp}",
+                                timeout=self.timeout)
+        res_data = response.json()
+        if res_data.get("Status") != "Success":
+            raise RuntimeError(f"2Factor error: {res_data}")
+
+    def close(self):
+        pass
+
+class LocalTransport:
+    """Offline stand-in for SMTP and 2Factor.
+
+    Appends each delivery as a JSON line to LOCAL_OUTBOX_PATH (if set) and
+    keeps it in `sent`. LOCAL_TRANSPORT_DELAY_MS simulates provider latency
+    for throughput testing.
+    """
+
+    sent = []
+    _lock = threading.Lock()
+
+    def __init__(self, config):
+        self.path = config.get("LOCAL_OUTBOX_PATH")
+        self.delay = config.get("LOCAL_TRANSPORT_DELAY_MS", 0) / 1000.0
+
+    def _deliver(self, record):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.sent.append(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def send_email(self, to, subject, body):
+        self._deliver({"kind": "email", "to": to, "subject": subject, "body": body})
+
+    def send_sms_otp(self, to, otp):
+        self._deliver({"kind": "sms", "to": to, "otp": otp})
+
+    def close(self):
+        pass
+
+# ---------------------------- Worker ----------------------------
+class JobWorker:
+    """Claims due jobs and delivers them; one instance per worker thread.
+
+    Claims are conditional UPDATEs, so several threads and gunicorn workers
+    can drain the same table without delivering a job twice. Delivered jobs
+    are deleted and failed ones keep only a redacted payload, so OTPs never
+    outlive their delivery; failed jobs are swept after JOB_FAILED_RETENTION_DAYS.
+    """
+
+    def __init__(self, config):
+        self.batch_size = config.get("JOB_BATCH_SIZE", 10)
+        local = config.get("MAIL_TRANSPORT") == "local"
+        self.mailer = LocalTransport(config) if local else SmtpTransport(config)
+        local = config.get("SMS_TRANSPORT") == "local"
+        self.sms = LocalTransport(config) if local else TwoFactorTransport(config)
+        self.failed_retention = timedelta(days=config.get("JOB_FAILED_RETENTION_DAYS", 7))
+        self.sweep_interval = config.get("JOB_SWEEP_SECONDS", 3600)
+        self._next_sweep = 0.0
+
+    def _claim(self):
+        now = now_ist()
+        due = or_(
+            and_(OutboundJob.status == "pending", OutboundJob.run_after <= now),
+            and_(OutboundJob.status == "running", OutboundJob.locked_at < now - JOB_LOCK_TIMEOUT),
+        )
+        candidates = [
+            job_id for (job_id,) in db.session.query(OutboundJob.job_id)
+            .filter(due).order_by(OutboundJob.job_id).limit(self.batch_size)
+        ]
+        claimed = []
+        for job_id in candidates:
+            result = db.session.execute(
+                update(OutboundJob)
+                .where(OutboundJob.job_id == job_id, due)
+                .values(status="running", locked_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append(job_id)
+        db.session.commit()
+        return claimed
+
+    def _deliver(self, job):
+        payload = json.loads(job.payload)
+        if job.kind == "email":
+            self.mailer.send_email(payload["to"], payload["subject"], payload["body"])
+        elif job.kind == "sms":
+            self.sms.send_sms_otp(payload["to"], payload["otp"])
+        else:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+
+    def run_once(self):
+        """Deliver one batch of due jobs; returns how many were processed."""
+        claimed = self._claim()
+        for job_id in claimed:
+            job = db.session.get(OutboundJob, job_id)
+            try:
+                self._deliver(job)
+            except Exception as e:
+                job.attempts += 1
+                job.last_error = str(e)[:2000]
+                if job.attempts >= job.max_attempts:
+                    job.status = "failed"
+                    job.payload = json.dumps({k: v for k, v in json.loads(job.payload).items()
+                                              if k in REDACTED_KEEP})
+                    current_app.logger.error("Job %s (%s) failed permanently: %s", job.job_id, job.kind, e)
+                else:
+                    job.status = "pending"
+                    job.run_after = retry_at(job.attempts)
+                job.locked_at = None
+            else:
+                db.session.delete(job)
+            db.session.commit()
+        return len(claimed)
+
+    def sweep(self):
+        """Delete failed jobs older than the retention period; returns how many were removed."""
+        result = db.session.execute(
+            delete(OutboundJob)
+            .where(OutboundJob.status == "failed", OutboundJob.updated_at < now_ist() - self.failed_retention)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def drain(self):
+        """Deliver batches until nothing is due, sweeping old failures every JOB_SWEEP_SECONDS."""
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+        total = 0
+        while True:
+            processed = self.run_once()
+            total += processed
+            if not processed:
+                return total
+
+    def close(self):
+        self.mailer.close()
+        self.sms.close()
+
+def init_app(app):
+    """Register JOB_WORKERS worker threads, each with its own connections.
+
+    They run in the one process per host elected by start_background_tasks();
+    `flask run-jobs` drains in the foreground instead.
+    """
+    for n in range(app.config.get("JOB_WORKERS", 2)):
+        worker = JobWorker(app.config)
+        register_periodic(app, f"job-worker-{n}", app.config.get("JOB_POLL_SECONDS", 1), worker.drain,
+                          shared=True)
@@ -0,0 +1,239 @@
+import glob
+import json
+import os
+import threading
+import time
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+from utils.background import register_periodic
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+HELP = {
+    "http_request_duration_seconds": ("histogram", "Request latency by endpoint"),
+    "http_request_sql_statements": ("histogram", "SQL statements executed per request"),
+    "sql_statements_total": ("counter", "SQL statements executed"),
+    "sql_duration_seconds_total": ("counter", "Time spent executing SQL"),
+    "db_pool_checkouts_total": ("counter", "Connections checked out of the pool"),
+    "db_pool_connects_total": ("counter", "New DB connections opened"),
+    "db_pool_checked_out": ("gauge", "Connections currently checked out"),
+    "db_pool_overflow": ("gauge", "Connections open beyond pool_size"),
+    "cache_requests_total": ("counter", "Cache lookups by result"),
+}
+
+class Registry:
+    """Counters, histograms and gauge callbacks for this process.
+
+    Updates are a dict lookup under a lock. Under gunicorn, each worker
+    writes its snapshot to METRICS_DIR and /metrics merges every file:
+    counters and histograms are summed, and gauges keep a pid label.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauge_callbacks = []
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets),
+                                               "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist["counts"][i] += 1
+                    break
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def snapshot(self):
+        gauges = []
+        for callback in self.gauge_callbacks:
+            gauges.extend(callback())
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, dict(labels), dict(h, counts=list(h["counts"]))]
+                               for (name, labels), h in self.histograms.items()],
+                "gauges": [[name, dict(labels, pid=str(os.getpid())), value] for name, labels, value in gauges],
+            }
+
+registry = Registry()
+
+def record_cache(cache, hit):
+    """Count one lookup in a named cache (google_certs, device_package, schedules_etag...)."""
+    registry.inc("cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+# ---------------- Aggregation and exposition ----------------
+def merge(snapshots):
+    counters, histograms, gauges = {}, {}, []
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snap["histograms"]:
+            key = (name, tuple(sorted(labels.items())))
+            merged = histograms.setdefault(key, {"buckets": h["buckets"], "counts": [0] * len(h["buckets"]),
+                                                 "sum": 0.0, "count": 0})
+            merged["counts"] = [a + b for a, b in zip(merged["counts"], h["counts"])]
+            merged["sum"] += h["sum"]
+            merged["count"] += h["count"]
+        gauges.extend(snap["gauges"])
+    return counters, histograms, gauges
+
+def _labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+def render(counters, histograms, gauges):
+    """Prometheus text exposition format (version 0.0.4)."""
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), h in histograms.items():
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(h["buckets"], h["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, {'le': bound})} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, {'le': '+Inf'})} {h['count']}")
+        lines.append(f"{name}_sum{_labels(labels)} {h['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {h['count']}")
+    for name, labels, value in gauges:
+        by_name.setdefault(name, []).append(f"{name}{_labels(sorted(labels.items()))} {value}")
+    out = []
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ("untyped", name))
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(by_name[name])
+    return "\n".join(out) + "\n"
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MetricsStore:
+    """Per-pid snapshot files in METRICS_DIR, so any worker can serve the whole pod's metrics."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, snapshot):
+        path = os.path.join(self.directory, f"metrics_{snapshot['pid']}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def read_all(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            try:
+                with open(path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(snap["pid"]):
+                snap["gauges"] = []  # an exited worker's counters still count, its pool doesn't
+            snapshots.append(snap)
+        return snapshots
+
+# ---------------- Instrumentation ----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    if conn is not None and exception_context.statement is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    endpoint = "background"
+    if has_request_context():
+        g.sql_statements = g.get("sql_statements", 0) + 1
+        g.sql_seconds = g.get("sql_seconds", 0.0) + elapsed
+        endpoint = request.endpoint or "unmatched"
+    registry.inc("sql_statements_total", {"endpoint": endpoint})
+    registry.inc("sql_duration_seconds_total", {"endpoint": endpoint}, elapsed)
+
+def instrument_engine(bind, engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    labels = {"bind": bind}
+    event.listen(engine, "checkout", lambda *a: registry.inc("db_pool_checkouts_total", labels))
+    event.listen(engine, "connect", lambda *a: registry.inc("db_pool_connects_total", labels))
+
+    def pool_gauges():
+        pool = engine.pool
+        gauges = []
+        if hasattr(pool, "checkedout"):
+            gauges.append(("db_pool_checked_out", labels, pool.checkedout()))
+        if hasattr(pool, "overflow"):
+            gauges.append(("db_pool_overflow", labels, max(pool.overflow(), 0)))
+        return gauges
+
+    registry.gauge_callbacks.append(pool_gauges)
+
+def init_app(app, db):
+    """Instrument requests and every engine, and serve /metrics.
+
+    Each worker flushes its snapshot to METRICS_DIR (default
+    instance/metrics) every METRICS_FLUSH_SECONDS and /metrics aggregates
+    the directory; gunicorn.conf.py clears it when the master starts.
+    METRICS_TOKEN, if set, is required as a bearer token.
+    """
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_engine(bind or "primary", engine)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("request_start", None)
+        if start is None:
+            return response
+        labels = {"endpoint": request.endpoint or "unmatched", "method": request.method}
+        registry.observe("http_request_duration_seconds", dict(labels, status=str(response.status_code)),
+                         time.perf_counter() - start, LATENCY_BUCKETS)
+        registry.observe("http_request_sql_statements", labels, g.get("sql_statements", 0), SQL_COUNT_BUCKETS)
+        return response
+
+    store = MetricsStore(app.config.get("METRICS_DIR") or os.path.join(app.instance_path, "metrics"))
+    register_periodic(app, "metrics-flush", app.config.get("METRICS_FLUSH_SECONDS", 5),
+                      lambda: store.write(registry.snapshot()))
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        token = app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(403)
+        store.write(registry.snapshot())
+        return Response(render(*merge(store.read_all())), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import delete, update
+from extensions import db
+from models.models import OtpCode
+from utils.background import register_periodic
+from utils.timezone import now_ist, ensure_ist
+
+MAX_OTP_ATTEMPTS = 5
+
+class OtpStore(ABC):
+    """Shared TTL store for OTPs, keyed by email.
+
+    Backends must be visible to every gunicorn worker. verify() returns None
+    when the code matches (and consumes it) or an error message; a code is
+    discarded after MAX_OTP_ATTEMPTS wrong guesses.
+    """
+
+    @abstractmethod
+    def put(self, key, otp, ttl_seconds, mobile=None):
+        ...
+
+    @abstractmethod
+    def verify(self, key, otp):
+        ...
+
+    @abstractmethod
+    def discard(self, key):
+        ...
+
+    @abstractmethod
+    def sweep(self):
+        """Delete expired codes; returns how many were removed."""
+
+class DbOtpStore(OtpStore):
+    """Keeps codes in the otp_codes table of the application database."""
+
+    def put(self, key, otp, ttl_seconds, mobile=None):
+        db.session.merge(OtpCode(key=key, otp=str(otp), attempts=0, mobile=mobile,
+                                 expires_at=now_ist() + timedelta(seconds=ttl_seconds),
+                                 created_at=now_ist()))
+        db.session.commit()
+
+    def verify(self, key, otp):
+        # Spend an attempt first, then consume the code only if it matches, so
+        # concurrent guesses can neither exceed the limit nor reuse a code.
+        now = now_ist()
+        spent = db.session.execute(
+            update(OtpCode)
+            .where(OtpCode.key == key, OtpCode.attempts < MAX_OTP_ATTEMPTS, OtpCode.expires_at >= now)
+            .values(attempts=OtpCode.attempts + 1)
+        )
+        db.session.commit()
+        if spent.rowcount == 0:
+            record = db.session.get(OtpCode, key)
+            if record is None:
+                return "OTP not requested"
+            self.discard(key)
+            return "OTP expired" if now > ensure_ist(record.expires_at) else "Too many attempts"
+        used = db.session.execute(delete(OtpCode).where(OtpCode.key == key, OtpCode.otp == str(otp)))
+        db.session.commit()
+        if used.rowcount == 1:
+            return None
+        attempts = db.session.query(OtpCode.attempts).filter(OtpCode.key == key).scalar()
+        if attempts is not None and attempts >= MAX_OTP_ATTEMPTS:
+            self.discard(key)
+            return "Too many attempts"
+        return "Invalid OTP"
+
+    def discard(self, key):
+        db.session.execute(delete(OtpCode).where(OtpCode.key == key))
+        db.session.commit()
+
+    def sweep(self):
+        result = db.session.execute(delete(OtpCode).where(OtpCode.expires_at < now_ist()))
+        db.session.commit()
+        return result.rowcount
+
+class SqliteOtpStore(OtpStore):
+    """Keeps codes in a local SQLite file shared by the workers on one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS otp_codes ("
+                " key TEXT PRIMARY KEY, otp TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, mobile TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_otp_codes_expires_at ON otp_codes (expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, key, otp, ttl_seconds, mobile=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO otp_codes (key, otp, expires_at, attempts, mobile)"
+                " VALUES (?, ?, ?, 0, ?)",
+                (key, str(otp), time.time() + ttl_seconds, mobile),
+            )
+
+    def verify(self, key, otp):
+        now = time.time()
+        with self._connect() as conn:
+            spent = conn.execute(
+                "UPDATE otp_codes SET attempts = attempts + 1"
+                " WHERE key = ? AND attempts < ? AND expires_at >= ?",
+                (key, MAX_OTP_ATTEMPTS, now),
+            ).rowcount
+        if spent == 0:
+            with self._connect() as conn:
+                row = conn.execute("SELECT expires_at FROM otp_codes WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return "OTP not requested"
+                conn.execute("DELETE FROM otp_codes WHERE key = ?", (key,))
+            return "OTP expired" if now > row[0] else "Too many attempts"
+        with self._connect() as conn:
+            if conn.execute("DELETE FROM otp_codes WHERE key = ? AND otp = ?", (key, str(otp))).rowcount == 1:
+                return None
+            row = conn.execute("SELECT attempts FROM otp_codes WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] >= MAX_OTP_ATTEMPTS:
+                conn.execute("DELETE FROM otp_codes WHERE key = ?", (key,))
+                return "Too many attempts"
+        return "Invalid OTP"
+
+    def discard(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM otp_codes WHERE key = ?", (key,))
+
+    def sweep(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM otp_codes WHERE expires_at < ?", (time.time(),)).rowcount
+
+def init_app(app):
+    """Create the OTP_STORE backend ("db" or "sqlite") and start its expiry sweeper."""
+    backend = app.config.get("OTP_STORE", "db")
+    if backend == "sqlite":
+        path = app.config.get("OTP_SQLITE_PATH") or os.path.join(app.instance_path, "otp.sqlite3")
+        store = SqliteOtpStore(path)
+    elif backend == "db":
+        store = DbOtpStore()
+    else:
+        raise ValueError(f"Unsupported OTP_STORE: {backend}")
+    app.extensions["otp_store"] = store
+    register_periodic(app, "otp-sweeper", app.config.get("OTP_SWEEP_SECONDS", 60), store.sweep, shared=True)
+
+def get_otp_store() -> OtpStore:
+    return current_app.extensions["otp_store"]
@@ -0,0 +1,52 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values) -> str:
+    """Pack the sort key of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def page_args(args):
+    """Read `limit`/`cursor` query args for keyset pagination.
+
+    Returns (limit, cursor_values). Both are None when the client asked for
+    neither, so existing callers keep getting the full list. Raises ValueError
+    for a malformed limit or cursor.
+    """
+    if "limit" not in args and "cursor" not in args:
+        return None, None
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    cursor = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    return min(limit, MAX_PAGE_SIZE), cursor
+
+def field_args(args, allowed):
+    """Return the requested `fields=` subset of `allowed` (all of it if not given).
+
+    Raises ValueError naming any unknown field.
+    """
+    raw = args.get("fields")
+    if not raw:
+        return list(allowed)
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def set_next_cursor(response, rows, limit, key):
+    """Add an X-Next-Cursor header when the page is full; `key(row)` gives its sort key."""
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(key(rows[-1]))
+    return response
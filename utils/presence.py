@@ -0,0 +1,85 @@
+import threading
+from datetime import timedelta
+from sqlalchemy import or_, update
+from extensions import db
+from models.models import Device
+from utils.background import register_periodic
+from utils.timezone import now_ist, ensure_ist
+
+# A device counts as active if it polled fetch-schedules within this window
+DEVICE_LIVENESS_SECONDS = 180
+# Devices poll fetch-schedules on this interval
+FETCH_INTERVAL = timedelta(minutes=3)
+
+class PresenceRegistry:
+    """Device heartbeats held in memory and written to the DB in batches.
+
+    fetch-schedules records a heartbeat here instead of committing per poll.
+    A periodic sweep flushes the newest heartbeat per device with one bulk
+    UPDATE and marks devices inactive once their last fetch is older than
+    DEVICE_LIVENESS_SECONDS, so reads never have to write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_seen = {}  # device_id -> latest heartbeat seen by this worker
+        self._pending = {}    # device_id -> heartbeat not yet flushed
+
+    def init_app(self, app):
+        interval = app.config.get("PRESENCE_SWEEP_SECONDS", 15)
+        register_periodic(app, "presence-sweeper", interval, self.sweep)
+
+    def heartbeat(self, device_id, at=None):
+        at = at or now_ist()
+        with self._lock:
+            self._last_seen[device_id] = at
+            self._pending[device_id] = at
+
+    def last_seen(self, device_id, stored=None):
+        """Newest of this worker's heartbeat and the stored `last_fetch_time`."""
+        seen = self._last_seen.get(device_id)
+        stored = ensure_ist(stored)
+        if seen is None or (stored is not None and stored > seen):
+            return stored
+        return seen
+
+    def is_active(self, device_id, stored=None, now=None):
+        seen = self.last_seen(device_id, stored)
+        if seen is None:
+            return False
+        return ((now or now_ist()) - seen).total_seconds() < DEVICE_LIVENESS_SECONDS
+
+    def sweep(self):
+        """Flush pending heartbeats and mark expired devices inactive."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            cutoff = now_ist() - timedelta(seconds=DEVICE_LIVENESS_SECONDS)
+            self._last_seen = {k: v for k, v in self._last_seen.items() if v >= cutoff}
+
+        try:
+            if pending:
+                db.session.execute(update(Device), [
+                    {"device_id": device_id, "status": "active",
+                     "last_fetch_time": at, "next_fetch_time": at + FETCH_INTERVAL}
+                    for device_id, at in pending.items()
+                ])
+            # Guarded on last_fetch_time, so a device another worker just flushed stays active
+            db.session.execute(
+                update(Device)
+                .where(
+                    Device.status != "inactive",
+                    or_(Device.last_fetch_time.is_(None), Device.last_fetch_time < cutoff),
+                )
+                .values(status="inactive")
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Keep the heartbeats for the next sweep unless newer ones arrived
+            with self._lock:
+                for device_id, at in pending.items():
+                    self._pending.setdefault(device_id, at)
+            raise
+
+presence = PresenceRegistry()
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from sqlalchemy import func
+from extensions import db
+from models.models import PlayRollup
+from utils.timezone import now_ist
+
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+
+def parse_day_range(args):
+    """Read inclusive `from`/`to` (YYYY-MM-DD) query args; defaults to the last 30 IST days.
+
+    Raises ValueError for malformed or oversized ranges.
+    """
+    end = date.fromisoformat(args["to"]) if args.get("to") else now_ist().date()
+    start = date.fromisoformat(args["from"]) if args.get("from") else end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    if (end - start).days >= MAX_REPORT_DAYS:
+        raise ValueError(f"Range is limited to {MAX_REPORT_DAYS} days")
+    return start, end
+
+def play_totals(start, end, group_by, **filters):
+    """Sum PlayRollup rows in [start, end] matching `filters`, grouped by `group_by` column name."""
+    group_col = getattr(PlayRollup, group_by)
+    query = (
+        db.session.query(
+            group_col,
+            func.sum(PlayRollup.play_count),
+            func.sum(PlayRollup.play_seconds),
+        )
+        .filter(PlayRollup.day >= start, PlayRollup.day <= end)
+        .filter_by(**filters)
+        .group_by(group_col)
+        .order_by(group_col)
+    )
+    return [(key, int(plays or 0), int(seconds or 0)) for key, plays, seconds in query.all()]
+
+def play_report(start, end, group_by, group_label, **filters):
+    """Build the JSON body for a proof-of-play report.
+
+    Returns overall totals plus rows per `group_by` value (under `group_label`)
+    and per day.
+    """
+    groups = play_totals(start, end, group_by, **filters)
+    days = play_totals(start, end, "day", **filters)
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total_plays": sum(plays for _, plays, _ in days),
+        "total_seconds": sum(seconds for _, _, seconds in days),
+        group_label: [
+            {group_by: key, "plays": plays, "seconds": seconds} for key, plays, seconds in groups
+        ],
+        "days": [
+            {"day": key.isoformat(), "plays": plays, "seconds": seconds} for key, plays, seconds in days
+        ],
+    }
@@ -0,0 +1,104 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+_IN_LIST_RE = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in QUERY_BUDGET_MODE=raise when a request breaks its budget or repeats a query."""
+
+def normalize(statement):
+    """Collapse IN-lists and literals so the same query in a loop compares equal."""
+    statement = _IN_LIST_RE.sub("(?)", statement)
+    return " ".join(_NUMBER_RE.sub("N", statement).split())
+
+def query_budget(max_queries):
+    """Declare how many SQL statements a view may run per request."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_budget = max_queries
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "query_log" in g:
+        g.query_log.append(statement)
+
+def check_queries(statements, budget, repeat_threshold, where):
+    """Return problems found in one request's statements, worst first."""
+    problems = []
+    if budget is not None and len(statements) > budget:
+        problems.append(f"{where} ran {len(statements)} queries (budget {budget})")
+    for statement, count in Counter(normalize(s) for s in statements).most_common():
+        if count < repeat_threshold:
+            break
+        problems.append(f"{where} repeated a query {count} times (possible N+1): {statement[:300]}")
+    return problems
+
+def init_app(app, db):
+    """Count statements per request when QUERY_BUDGET_MODE is "warn" or "raise".
+
+    Flags requests that exceed their @query_budget (or QUERY_BUDGET_DEFAULT)
+    and statements repeated QUERY_REPEAT_THRESHOLD or more times. Off by
+    default; meant for development and tests.
+    """
+    mode = app.config.get("QUERY_BUDGET_MODE", "off")
+    if mode not in ("warn", "raise"):
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _record_statement)
+
+    @app.before_request
+    def start_query_log():
+        g.query_log = []
+
+    @app.after_request
+    def check_query_log(response):
+        statements = g.pop("query_log", None)
+        if statements is None:
+            return response
+        problems = check_queries(
+            statements,
+            g.get("query_budget", app.config.get("QUERY_BUDGET_DEFAULT")),
+            app.config.get("QUERY_REPEAT_THRESHOLD", 5),
+            f"{request.method} {request.path}",
+        )
+        if problems and mode == "raise":
+            raise QueryBudgetExceeded("\n".join(problems))
+        for problem in problems:
+            current_app.logger.warning(problem)
+        return response
+
+@contextmanager
+def assert_max_queries(max_queries, engine=None, repeat_threshold=None):
+    """Fail if the block runs more than `max_queries` statements (or repeats one).
+
+        with assert_max_queries(3):
+            client.post("/api/devices/fetch-schedules", json=...)
+    """
+    from extensions import db
+    engines = [engine] if engine is not None else list(db.engines.values())
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for e in engines:
+        event.listen(e, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", record)
+    if repeat_threshold is None:
+        repeat_threshold = current_app.config.get("QUERY_REPEAT_THRESHOLD", 5)
+    problems = check_queries(statements, max_queries, repeat_threshold, "block")
+    if problems:
+        raise QueryBudgetExceeded("\n".join(problems + statements))
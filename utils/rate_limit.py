@@ -0,0 +1,175 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+from utils.background import register_periodic
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+def parse_limit(spec):
+    """Parse "10/minute" (or "10/30s") into (capacity, refill tokens per second)."""
+    count, _, period = spec.partition("/")
+    if period.endswith("s") and period[:-1].isdigit():
+        seconds = int(period[:-1])
+    else:
+        seconds = PERIODS[period.rstrip("s")]
+    capacity = int(count)
+    return capacity, capacity / seconds
+
+def refill(tokens, updated, now, capacity, rate):
+    """Apply one token-bucket take; returns (tokens, allowed, retry_after_seconds)."""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0
+    return tokens, False, (1 - tokens) / rate
+
+class MemoryBuckets:
+    """Per-process buckets for a single process or tests.
+
+    Every gunicorn worker enforces the full limit on its own, so a host with
+    N workers lets through up to N times the limit; use SqliteBuckets there.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, allowed, retry_after = refill(tokens, updated, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+    def sweep(self, max_idle):
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            stale = [k for k, (_, updated) in self._buckets.items() if updated < cutoff]
+            for key in stale:
+                del self._buckets[key]
+        return len(stale)
+
+class SqliteBuckets:
+    """Buckets in a local SQLite file so all workers on a host share one limit."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # counters, not records
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, allowed, retry_after = refill(tokens, updated, now, capacity, rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+    def sweep(self, max_idle):
+        conn = self._connect()
+        return conn.execute(
+            "DELETE FROM rate_buckets WHERE updated < ?", (time.time() - max_idle,)
+        ).rowcount
+
+class RateLimiter:
+    def __init__(self, buckets, overrides=None, enabled=True):
+        self.buckets = buckets
+        self.overrides = overrides or {}
+        self.enabled = enabled
+        self._limits = {}
+
+    def limit_for(self, name, default):
+        if name not in self._limits:
+            self._limits[name] = parse_limit(self.overrides.get(name, default))
+        return self._limits[name]
+
+    def hit(self, name, default, key):
+        capacity, rate = self.limit_for(name, default)
+        return self.buckets.take(f"{name}:{key}", capacity, rate)
+
+def parse_overrides(value):
+    """RATE_LIMITS may be a dict or "login=5/minute,signup=3/minute"."""
+    if isinstance(value, dict):
+        return value
+    pairs = (item.split("=", 1) for item in (value or "").split(",") if "=" in item)
+    return {name.strip(): spec.strip() for name, spec in pairs}
+
+def init_app(app):
+    """Create the RATE_LIMIT_STORAGE buckets ("sqlite", or "memory" when testing) and sweep idle ones."""
+    storage = app.config.get("RATE_LIMIT_STORAGE", "memory" if app.testing else "sqlite")
+    if storage == "sqlite":
+        path = app.config.get("RATE_LIMIT_SQLITE_PATH") or os.path.join(app.instance_path, "rate_limits.sqlite3")
+        buckets = SqliteBuckets(path)
+    elif storage == "memory":
+        buckets = MemoryBuckets()
+    else:
+        raise ValueError(f"Unsupported RATE_LIMIT_STORAGE: {storage}")
+    limiter = RateLimiter(
+        buckets,
+        overrides=parse_overrides(app.config.get("RATE_LIMITS")),
+        enabled=app.config.get("RATE_LIMIT_ENABLED", True),
+    )
+    app.extensions["rate_limiter"] = limiter
+    register_periodic(app, "rate-limit-sweeper", 300, lambda: buckets.sweep(max_idle=86400))
+
+# ---------------- Key functions ----------------
+def client_ip():
+    return request.remote_addr  # ProxyFix has already applied X-Forwarded-For
+
+def json_field(field):
+    """Key on a request body field (e.g. email, device_token); falls back to the client IP."""
+    def key():
+        data = request.get_json(silent=True) or {}
+        value = data.get(field)
+        return f"{field}={str(value).strip().lower()}" if value else f"ip={client_ip()}"
+    return key
+
+def rate_limit(name, default, key=client_ip):
+    """Reject with 429 and Retry-After once the `name` bucket for this key is empty.
+
+    `default` is a spec such as "10/minute"; RATE_LIMITS can override it per name.
+    Stack the decorator to apply several limits (e.g. per IP and per email).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get("rate_limiter")
+            if limiter is None or not limiter.enabled or request.method == "OPTIONS":
+                return view(*args, **kwargs)
+            allowed, retry_after = limiter.hit(name, default, key())
+            if not allowed:
+                resp = jsonify({"error": "Too many requests"})
+                resp.status_code = 429
+                resp.headers["Retry-After"] = str(math.ceil(retry_after))
+                return resp
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import tempfile
+from datetime import timedelta
+from sqlalchemy import update
+from extensions import db
+from models.models import User, Video
+from utils.deletions import delete_video_rows, enqueue_deletions
+from utils.storage import extract_object_key
+from utils.timezone import now_ist
+
+RECONCILE_PREFIXES = ("videos/", "profiles/")
+SORT_BATCH_SIZE = 5000
+
+class DbKeyIndex:
+    """Storage keys referenced by the database, sorted on disk in a temp SQLite file.
+
+    Rows are streamed in with yield_per so memory stays bounded however
+    many videos and users there are; iter_keys() reads them back in the
+    same byte order the bucket listing uses.
+    """
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(suffix=".sqlite3", prefix="reconcile-")
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE keys (key TEXT NOT NULL, kind TEXT NOT NULL, row_id INTEGER NOT NULL)")
+
+    def load(self):
+        sources = (
+            ("video", db.session.query(Video.video_id, Video.video_link).filter(Video.video_link.isnot(None))),
+            ("profile", db.session.query(User.userId, User.profile_photo_url).filter(User.profile_photo_url.isnot(None))),
+        )
+        for kind, query in sources:
+            batch = []
+            for row_id, url in query.yield_per(SORT_BATCH_SIZE):
+                batch.append((extract_object_key(url), kind, row_id))
+                if len(batch) >= SORT_BATCH_SIZE:
+                    self.conn.executemany("INSERT INTO keys VALUES (?, ?, ?)", batch)
+                    batch = []
+            self.conn.executemany("INSERT INTO keys VALUES (?, ?, ?)", batch)
+        self.conn.execute("CREATE INDEX ix_keys_key ON keys (key)")
+        self.conn.commit()
+        return self
+
+    def iter_keys(self, prefix, start_after=None):
+        """Yield (key, kind, row_id) under `prefix` in key order, after `start_after`."""
+        if start_after:
+            sql, bound = "SELECT key, kind, row_id FROM keys WHERE key > ? ORDER BY key", start_after
+        else:
+            sql, bound = "SELECT key, kind, row_id FROM keys WHERE key >= ? ORDER BY key", prefix
+        cursor = self.conn.execute(sql, (bound,))
+        for row in cursor:
+            if not row[0].startswith(prefix):
+                return
+            yield row
+
+    def close(self):
+        self.conn.close()
+        os.remove(self.path)
+
+def merge_join(object_pages, db_keys):
+    """Walk sorted bucket pages and sorted DB keys together.
+
+    Yields ("orphan_object", obj) for objects nothing references,
+    ("missing_object", (key, kind, row_id)) for rows whose object is gone and
+    ("page", next_token, last_key, object_count) after each bucket page.
+    """
+    db_iter = iter(db_keys)
+    pending = next(db_iter, None)
+    last_key = None
+    for objects, token in object_pages:
+        for obj in objects:
+            while pending is not None and pending[0] < obj["key"]:
+                yield "missing_object", pending
+                pending = next(db_iter, None)
+            if pending is not None and pending[0] == obj["key"]:
+                while pending is not None and pending[0] == obj["key"]:
+                    pending = next(db_iter, None)
+            else:
+                yield "orphan_object", obj
+            last_key = obj["key"]
+        yield "page", token, last_key, len(objects)
+    while pending is not None:
+        yield "missing_object", pending
+        pending = next(db_iter, None)
+
+def purge_missing_rows(missing):
+    """Clear profile photo URLs and delete video rows whose objects no longer exist."""
+    profile_ids = [row_id for _, kind, row_id in missing if kind == "profile"]
+    video_ids = [row_id for _, kind, row_id in missing if kind == "video"]
+    if profile_ids:
+        db.session.execute(update(User).where(User.userId.in_(profile_ids)).values(profile_photo_url=None))
+    if video_ids:
+        delete_video_rows(video_ids)
+
+def reconcile(storage, prefixes=RECONCILE_PREFIXES, start_after=None, continuation_token=None,
+              min_age=timedelta(hours=1), purge_objects=False, purge_rows=False, report=print):
+    """Report (and optionally purge) drift between the bucket and the DB; returns the counts.
+
+    Objects younger than `min_age` are skipped, since an upload lands in the
+    bucket before its row commits. Pass the last "resume" line's key as
+    `start_after` (and its token as `continuation_token`) to continue an
+    interrupted run.
+    """
+    counts = {"objects": 0, "orphan_objects": 0, "missing_objects": 0}
+    cutoff = now_ist() - min_age
+    index = DbKeyIndex().load()
+    try:
+        for prefix in sorted(prefixes):
+            after = token = None
+            if start_after and start_after.startswith(prefix):
+                after, token = start_after, continuation_token
+            elif start_after and start_after > prefix:
+                continue  # finished before the resume point
+            pages = storage.list_pages(prefix, start_after=after, continuation_token=token)
+            orphans, missing = [], []
+            for event in merge_join(pages, index.iter_keys(prefix, after)):
+                if event[0] == "orphan_object":
+                    obj = event[1]
+                    if obj["last_modified"] > cutoff:
+                        continue
+                    counts["orphan_objects"] += 1
+                    report(f"orphan object  {obj['key']}  {obj['size']} bytes")
+                    orphans.append(obj["key"])
+                elif event[0] == "missing_object":
+                    key, kind, row_id = event[1]
+                    counts["missing_objects"] += 1
+                    report(f"missing object {key}  ({kind} {row_id})")
+                    missing.append(event[1])
+                else:
+                    _, next_token, last_key, listed = event
+                    counts["objects"] += listed
+                    if purge_objects and orphans:
+                        enqueue_deletions(orphans)
+                    if purge_rows and missing:
+                        purge_missing_rows(missing)
+                    db.session.commit()
+                    orphans, missing = [], []
+                    if next_token and last_key:
+                        report(f"resume: --start-after {last_key} --continuation-token {next_token}")
+            if purge_rows and missing:
+                purge_missing_rows(missing)
+                db.session.commit()
+    finally:
+        index.close()
+    return counts
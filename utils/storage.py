@@ -0,0 +1,294 @@
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+import threading
+from flask import abort, current_app, send_file, url_for
+
+class StorageBackend(ABC):
+    """Object storage used for videos and profile photos.
+
+    Keys look like "videos/<user_id>/<random>_<filename>". list_pages() yields
+    (objects, next_token) in key order, where each object is a dict with
+    key, size and last_modified.
+    """
+
+    @abstractmethod
+    def upload(self, fileobj, key, content_type=None):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def delete_many(self, keys):
+        """Delete up to 1000 keys; returns {key: error message} for the ones that failed."""
+
+    @abstractmethod
+    def download_url(self, key, expires=300):
+        ...
+
+    @abstractmethod
+    def public_url(self, key):
+        ...
+
+    @abstractmethod
+    def extract_key(self, url):
+        ...
+
+    @abstractmethod
+    def list_pages(self, prefix="", start_after=None, continuation_token=None, page_size=1000):
+        ...
+
+    def list_keys(self, prefix="", start_after=None):
+        for objects, _ in self.list_pages(prefix, start_after=start_after):
+            yield from objects
+
+class R2Storage(StorageBackend):
+    """Cloudflare R2 (or any S3 API) through one pooled, retrying boto3 client per worker.
+
+    boto3 is imported and the client built on first use, not at app start-up.
+    """
+
+    def __init__(self, account_id, access_key_id, secret_access_key, bucket,
+                 public_base_url=None, max_pool_connections=50, max_attempts=5):
+        self.endpoint_url = f"https://{account_id}.r2.cloudflarestorage.com"
+        self.bucket = bucket
+        self.public_base_url = public_base_url
+        self._credentials = (access_key_id, secret_access_key)
+        self._max_pool_connections = max_pool_connections
+        self._max_attempts = max_attempts
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config as BotoConfig
+                    access_key_id, secret_access_key = self._credentials
+                    self._client = boto3.client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=access_key_id,
+                        aws_secret_access_key=secret_access_key,
+                        config=BotoConfig(
+                            max_pool_connections=self._max_pool_connections,
+                            retries={"max_attempts": self._max_attempts, "mode": "standard"},
+                            tcp_keepalive=True,
+                        ),
+                    )
+        return self._client
+
+    def upload(self, fileobj, key, content_type=None):
+        extra = {"ContentType": content_type} if content_type else None
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def delete_many(self, keys):
+        resp = self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+        )
+        return {e["Key"]: f'{e.get("Code")}: {e.get("Message")}' for e in resp.get("Errors", [])}
+
+    def download_url(self, key, expires=300):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires
+        )
+
+    def public_url(self, key):
+        """Public URL for a key; falls back to the account API endpoint without PUBLIC_BASE_URL."""
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return f"{self.endpoint_url}/{self.bucket}/{key}"
+
+    def extract_key(self, url):
+        """Best-effort to get the object key from a stored URL regardless of domain style."""
+        if self.public_base_url and url.startswith(self.public_base_url + "/"):
+            return url[len(self.public_base_url) + 1:]
+        api_prefix = f"{self.endpoint_url}/"
+        if url.startswith(api_prefix):
+            suffix = url[len(api_prefix):]
+            if suffix.startswith(f"{self.bucket}/"):
+                return suffix[len(self.bucket) + 1:]
+            return suffix
+        parts = url.split("/")
+        if self.bucket in parts:
+            idx = parts.index(self.bucket)
+            return "/".join(parts[idx + 1:])
+        return "/".join(parts[3:]) if len(parts) > 3 else parts[-1]
+
+    def list_pages(self, prefix="", start_after=None, continuation_token=None, page_size=1000):
+        params = {"Bucket": self.bucket, "Prefix": prefix, "MaxKeys": page_size}
+        if continuation_token:
+            params["ContinuationToken"] = continuation_token
+        elif start_after:
+            params["StartAfter"] = start_after
+        while True:
+            resp = self.client.list_objects_v2(**params)
+            objects = [
+                {"key": o["Key"], "size": o["Size"], "last_modified": o["LastModified"]}
+                for o in resp.get("Contents", [])
+            ]
+            token = resp.get("NextContinuationToken") if resp.get("IsTruncated") else None
+            yield objects, token
+            if not token:
+                return
+            params["ContinuationToken"] = token
+
+class LocalStorage(StorageBackend):
+    """Files under a local directory, served by the app from /storage/<key>.
+
+    For on-prem installs and offline runs. Downloads go through send_file,
+    so Range requests and sendfile work as they do for the R2 CDN.
+    """
+
+    def __init__(self, root, public_base_url=None):
+        self.root = os.path.abspath(root)
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def upload(self, fileobj, key, content_type=None):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass  # S3 deletes are idempotent too
+
+    def delete_many(self, keys):
+        errors = {}
+        for key in keys:
+            try:
+                self.delete(key)
+            except (OSError, ValueError) as e:
+                errors[key] = str(e)
+        return errors
+
+    def download_url(self, key, expires=300):
+        return self.public_url(key)
+
+    def public_url(self, key):
+        """PUBLIC_BASE_URL/<key>, or this server's own /storage route (needs a request)."""
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return url_for("storage_file", key=key, _external=True)
+
+    def extract_key(self, url):
+        if self.public_base_url and url.startswith(self.public_base_url + "/"):
+            return url[len(self.public_base_url) + 1:]
+        if "/storage/" in url:
+            return url.split("/storage/", 1)[1]
+        parts = url.split("/")
+        return "/".join(parts[3:]) if len(parts) > 3 else parts[-1]
+
+    def _walk(self, directory, rel, prefix, after):
+        """Yield (key, stat) under `directory` in key order, skipping keys <= `after`.
+
+        Entries sort as "name" for files and "name/" for directories, which is
+        the order of the full keys, so only one directory listing per level
+        is held in memory and subtrees wholly before `after` are never opened.
+        """
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted((e.name + "/" if e.is_dir(follow_symlinks=False) else e.name, e) for e in it)
+        except FileNotFoundError:
+            return
+        for name, entry in entries:
+            key = rel + name
+            if name.endswith("/"):
+                if not (key.startswith(prefix) or prefix.startswith(key)):
+                    continue
+                if after and key < after and not after.startswith(key):
+                    continue
+                yield from self._walk(entry.path, key, prefix, after)
+            elif key.startswith(prefix) and not key.endswith(".part") and (not after or key > after):
+                yield key, entry.stat()
+
+    def list_pages(self, prefix="", start_after=None, continuation_token=None, page_size=1000):
+        page = []
+        for key, st in self._walk(self.root, "", prefix, continuation_token or start_after):
+            if len(page) == page_size:
+                yield page, page[-1]["key"]
+                page = []
+            page.append({
+                "key": key,
+                "size": st.st_size,
+                "last_modified": datetime.fromtimestamp(st.st_mtime, timezone.utc),
+            })
+        yield page, None
+
+    def serve(self, key):
+        try:
+            path = self.path_for(key)
+        except ValueError:
+            abort(404)
+        if not os.path.isfile(path):
+            abort(404)
+        return send_file(path, conditional=True, max_age=3600)
+
+def init_app(app):
+    """Create the STORAGE_BACKEND ("r2" or "local") once per worker.
+
+    R2 without credentials leaves storage unset, and routes answer
+    "Cloud storage not configured" as before.
+    """
+    backend = app.config.get("STORAGE_BACKEND", "r2")
+    if backend == "local":
+        root = app.config.get("STORAGE_LOCAL_ROOT") or os.path.join(app.instance_path, "storage")
+        storage = LocalStorage(root, app.config.get("PUBLIC_BASE_URL"))
+        app.add_url_rule("/storage/<path:key>", "storage_file", storage.serve)
+    elif backend == "r2":
+        creds = [app.config.get(k) for k in ("R2_ACCOUNT_ID", "R2_ACCESS_KEY_ID", "R2_SECRET_ACCESS_KEY", "R2_BUCKET_NAME")]
+        storage = R2Storage(
+            *creds,
+            public_base_url=app.config.get("PUBLIC_BASE_URL"),
+            max_pool_connections=app.config.get("STORAGE_MAX_POOL_CONNECTIONS", 50),
+            max_attempts=app.config.get("STORAGE_MAX_ATTEMPTS", 5),
+        ) if all(creds) else None
+    else:
+        raise ValueError(f"Unsupported STORAGE_BACKEND: {backend}")
+    app.extensions["storage"] = storage
+
+def get_storage():
+    """The worker's StorageBackend, or None when cloud storage isn't configured."""
+    return current_app.extensions.get("storage")
+
+def unique_object_key(directory: str, filename: str) -> str:
+    """Return "<directory>/<random>_<filename>" so a re-upload never reuses a key that is queued for deletion."""
+    return f"{directory}/{uuid.uuid4().hex[:12]}_{filename}"
+
+def build_public_url(object_key: str) -> str:
+    """Return a public URL for a given object key using the configured backend."""
+    storage = get_storage()
+    return storage.public_url(object_key) if storage else object_key
+
+def extract_object_key(file_url: str) -> str:
+    """Best-effort to get the object key from a stored URL regardless of domain style."""
+    storage = get_storage()
+    try:
+        if storage:
+            return storage.extract_key(file_url)
+        parts = file_url.split("/")
+        return "/".join(parts[3:]) if len(parts) > 3 else parts[-1]
+    except Exception:
+        return file_url
@@ -0,0 +1,36 @@
+from extensions import db
+
+def upsert(model, rows, index_elements, increment=(), overwrite=()):
+    """Insert `rows` into `model`, merging into existing rows on conflict.
+
+    Rows that collide on the unique key `index_elements` have the columns in
+    `increment` added to the stored value and the columns in `overwrite`
+    replaced. Issued as one multi-row statement in the current transaction.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind(mapper=model.__mapper__).dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(model).values(rows)
+        new = stmt.inserted
+    elif dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model).values(rows)
+        new = stmt.excluded
+    else:
+        raise ValueError(f"Upsert not supported for database dialect: {dialect}")
+
+    table = model.__table__
+    updates = {name: table.c[name] + new[name] for name in increment}
+    updates.update({name: new[name] for name in overwrite})
+
+    if dialect == "mysql":
+        stmt = stmt.on_duplicate_key_update(**updates)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=list(index_elements), set_=updates)
+    db.session.execute(stmt)
@@ -1,3 +1,5 @@
 from app import create_app
+from utils.background import start_background_tasks
 
 app = create_app()
+start_background_tasks(app)